@@ -6,13 +6,18 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage, ToolMessage, SystemMessage
-from typing import List, Dict, Any
-import json
-import numpy as np
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from typing import List, Dict, Any, Optional
+from contextvars import ContextVar
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import re
 from datetime import datetime, timedelta, timezone
 
 from . import crud, schemas, config, prompts
-from .db import SessionLocal
+from .cache import TTLCache
+from .db import session_scope
 
 # Initialize the LLM based on provider configuration
 # Defaults to Google Generative AI (Gemini)
@@ -21,54 +26,76 @@ if config.LLM_PROVIDER == "google_genai":
         model=config.LLM_MODEL_NAME,
         google_api_key=config.GOOGLE_API_KEY,
         temperature=0.0,  # We want deterministic, factual answers
+        # Passed to the SDK's httpx client: reuse TLS connections across
+        # calls instead of handshaking on every request.
+        client_args={
+            "limits": httpx.Limits(
+                max_connections=config.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            )
+        },
     )
 else:
     # Fallback or raise error if provider not supported
     raise ValueError(f"Unsupported LLM provider: {config.LLM_PROVIDER}")
 
+# The LLM runs at temperature 0, so an identical summary context yields an
+# identical summary; cache by context to skip the round-trip.
+summary_cache = TTLCache(maxsize=config.SUMMARY_CACHE_MAX_ENTRIES)
+
+# Answers to recently asked questions. Questions that differ only in case,
+# punctuation or spacing share an entry, skipping both LLM calls and the
+# tool queries.
+ask_cache = TTLCache(maxsize=config.ASK_CACHE_MAX_ENTRIES)
+
+
+# Reference time for the request being served, so every tool call in one
+# turn queries windows ending at the same instant.
+request_now: ContextVar[datetime] = ContextVar("request_now")
+
+
+def _now() -> datetime:
+    """Returns the request's reference time, or the current UTC time outside a request."""
+    now = request_now.get(None)
+    return now if now is not None else datetime.now(timezone.utc)
+
 
 # Define tools for the agent
 @tool
 def get_anomalies_for_asset(asset_id: str, minutes: int = 60) -> str:
     """Get all anomalies detected for a specific asset in the last X minutes."""
-    db = SessionLocal()
-    try:
-        end_time = datetime.now(timezone.utc)
+    with session_scope() as db:
+        end_time = _now()
         start_time = end_time - timedelta(minutes=minutes)
-        anomalies = crud.get_anomalies_by_asset(db, asset_id, start_time, end_time)
+        anomalies = crud.get_anomalies_by_asset_rows(db, asset_id, start_time, end_time)
         if not anomalies:
             return f"No anomalies detected for {asset_id} in the last {minutes} minutes."
-        result = f"Anomalies for {asset_id} in the last {minutes} minutes:\n"
-        for a in anomalies:
-            result += f"- Metric: {a.metric}, Score: {a.score:.2f}, Time: {a.timestamp}, Explanation: {a.explanation}\n"
-        return result
-    finally:
-        db.close()
+        lines = [f"Anomalies for {asset_id} in the last {minutes} minutes:\n"]
+        for _, metric, score, ts, explanation in anomalies:
+            lines.append(f"- Metric: {metric}, Score: {score:.2f}, Time: {ts}, Explanation: {explanation}\n")
+        return "".join(lines)
 
 
 @tool
 def get_anomalies_last_minutes(minutes: int) -> str:
     """Get all anomalies detected in the last X minutes across all assets."""
-    db = SessionLocal()
-    try:
-        end_time = datetime.now(timezone.utc)
+    with session_scope() as db:
+        end_time = _now()
         start_time = end_time - timedelta(minutes=minutes)
-        anomalies = crud.get_anomalies_by_asset(db, None, start_time, end_time)
+        anomalies = crud.get_anomalies_by_asset_rows(db, None, start_time, end_time)
         if not anomalies:
             return "No anomalies detected in the last {} minutes.".format(minutes)
-        result = "Anomalies in the last {} minutes:\n".format(minutes)
-        for a in anomalies:
-            result += f"- Asset: {a.asset_id}, Metric: {a.metric}, Score: {a.score:.2f}, Time: {a.timestamp}, Explanation: {a.explanation}\n"
-        return result
-    finally:
-        db.close()
+        lines = ["Anomalies in the last {} minutes:\n".format(minutes)]
+        for asset, metric, score, ts, explanation in anomalies:
+            lines.append(f"- Asset: {asset}, Metric: {metric}, Score: {score:.2f}, Time: {ts}, Explanation: {explanation}\n")
+        return "".join(lines)
 
 
 @tool
 def get_telemetry_at_timestamp(asset_id: str, metric: str, timestamp: str) -> str:
     """Get telemetry value for a specific asset, metric, and timestamp."""
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         # Parse timestamp
         ts = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
         # Find closest event
@@ -80,76 +107,120 @@ def get_telemetry_at_timestamp(asset_id: str, metric: str, timestamp: str) -> st
         # Find closest
         closest = min(events, key=lambda e: abs((e.timestamp - ts).total_seconds()))
         return f"At {closest.timestamp}: {metric} = {closest.value} {closest.unit}"
-    finally:
-        db.close()
 
 
 @tool
 def get_recent_telemetry(asset_id: str, minutes: int) -> str:
     """Get recent telemetry data for an asset in the last X minutes."""
-    db = SessionLocal()
-    try:
-        end_time = datetime.now(timezone.utc)
+    with session_scope() as db:
+        end_time = _now()
         start_time = end_time - timedelta(minutes=minutes)
-        telemetry = crud.get_telemetry_for_agent(db, asset_id, start_time, end_time)
+        # Only the 10 most recent events are shown, so only fetch those
+        telemetry = crud.get_telemetry_for_agent(
+            db, asset_id, start_time, end_time, limit=10
+        )
         if not telemetry:
             return f"No telemetry data for {asset_id} in the last {minutes} minutes."
-        result = f"Recent telemetry for {asset_id} (last {minutes} minutes):\n"
-        for t in telemetry[-10:]:  # Last 10 for brevity
-            result += f"- {t.timestamp}: {t.metric} = {t.value} {t.unit}\n"
-        return result
-    finally:
-        db.close()
+        lines = [f"Recent telemetry for {asset_id} (last {minutes} minutes):\n"]
+        for t in reversed(telemetry):  # Oldest first
+            lines.append(f"- {t.timestamp}: {t.metric} = {t.value} {t.unit}\n")
+        return "".join(lines)
 
 
 tools = [get_anomalies_for_asset, get_anomalies_last_minutes, get_telemetry_at_timestamp, get_recent_telemetry]
+TOOL_MAP = {t.name: t for t in tools}
+
+# Tool declarations are derived from each tool's signature and docstring;
+# serialize them once so binding never reflects over the functions again.
+_GEMINI_TOOL_SCHEMAS = [convert_to_openai_tool(t) for t in tools]
+
+# Built once at import; neither the tool schemas nor the prompt change per request.
+llm_with_tools = llm.bind_tools(_GEMINI_TOOL_SCHEMAS)
+SUMMARY_CHAIN = (
+    ChatPromptTemplate.from_messages(
+        [("system", prompts.SUMMARIZATION_SYSTEM_PROMPT), ("human", "{context}")]
+    )
+    | llm
+)
+
+# Tools are read-only, so the calls from a single LLM turn can run
+# concurrently instead of back-to-back. The request-scoped session is not
+# propagated into pool threads (a Session must not be shared across
+# threads), so each pooled call opens its own session.
+tool_executor = ThreadPoolExecutor(
+    max_workers=config.TOOL_EXECUTOR_MAX_WORKERS, thread_name_prefix="agent-tool"
+)
+
+
+def _run_tool(
+    tool_name: str, tool_args: Dict[str, Any], now: Optional[datetime] = None
+) -> str:
+    """
+    Run a single tool call by name. Pool threads do not inherit the caller's
+    context, so the request's reference time is passed in explicitly.
+    """
+    selected_tool = TOOL_MAP.get(tool_name)
+    if selected_tool is None:
+        return "Unknown tool"
+    if now is None:
+        return selected_tool.run(tool_args)
+    token = request_now.set(now)
+    try:
+        return selected_tool.run(tool_args)
+    finally:
+        request_now.reset(token)
 
 
 def get_summary_agent(asset_id: str, window_minutes: int) -> schemas.SummaryResponse:
     """
     Agent that generates a health summary for an asset.
     """
-    db = SessionLocal()
-    try:
-        end_time = datetime.now(timezone.utc)
+    with session_scope() as db:
+        end_time = _now()
         start_time = end_time - timedelta(minutes=window_minutes)
 
         # 1. Retrieve data using CRUD functions
-        anomalies = crud.get_anomalies_by_asset(db, asset_id, start_time, end_time)
-        telemetry = crud.get_telemetry_for_agent(db, asset_id, start_time, end_time)
+        # Only the 5 most recent anomalies go into the context
+        anomalies = crud.get_anomalies_by_asset_rows(
+            db, asset_id, start_time, end_time, limit=5
+        )
+        metric_stats = crud.get_telemetry_aggregates_for_agent(
+            db, asset_id, start_time, end_time
+        )
 
-        if not telemetry and not anomalies:
+        if not metric_stats and not anomalies:
             return schemas.SummaryResponse(
                 asset_id=asset_id,
                 summary="No telemetry data or anomalies found for the given time window.",
             )
 
         # 2. Aggregate and format the context for the LLM
-        context = _build_summary_context(anomalies, telemetry)
-
-        # 3. Create and run the LangChain chain
-        prompt = ChatPromptTemplate.from_messages(
-            [("system", prompts.SUMMARIZATION_SYSTEM_PROMPT), ("human", "{context}")]
-        )
-        chain = prompt | llm
+        context = _build_summary_context(anomalies, metric_stats)
 
-        raw_response = chain.invoke({"context": context})
+        cache_key = hashlib.blake2b(context.encode()).hexdigest()
+        summary_text = summary_cache.get(cache_key)
+        if summary_text is None:
+            # 3. Run the LangChain chain
+            raw_response = SUMMARY_CHAIN.invoke({"context": context})
 
-        # 4. Extract the content from AIMessage
-        summary_text = raw_response.content
+            # 4. Extract the content from AIMessage
+            summary_text = raw_response.content
+            summary_cache.set(cache_key, summary_text, ttl=max(window_minutes // 2, 1))
 
         return schemas.SummaryResponse(asset_id=asset_id, summary=summary_text)
 
-    finally:
-        db.close()
-
 
 def get_qa_agent(request: schemas.AskRequest) -> schemas.AskResponse:
     """
     Agent that answers a natural language question using tools.
     """
-    llm_with_tools = llm.bind_tools(tools)
+    cache_key = _ask_cache_key(request)
+    cached = ask_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
+    # Capture "now" once so all tool calls in this turn share one window end.
+    token = request_now.set(datetime.now(timezone.utc))
     try:
         # System prompt for conversational responses
         system_prompt = (
@@ -171,24 +242,32 @@ def get_qa_agent(request: schemas.AskRequest) -> schemas.AskResponse:
         sources = []
 
         if ai_msg.tool_calls:
-            tool_results = []
             for tool_call in ai_msg.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-                sources.append({"tool": tool_name, "input": tool_args})
-                if tool_name == "get_anomalies_for_asset":
-                    result = get_anomalies_for_asset.run(tool_args)
-                elif tool_name == "get_anomalies_last_minutes":
-                    result = get_anomalies_last_minutes.run(tool_args)
-                elif tool_name == "get_telemetry_at_timestamp":
-                    result = get_telemetry_at_timestamp.run(tool_args)
-                elif tool_name == "get_recent_telemetry":
-                    result = get_recent_telemetry.run(tool_args)
-                else:
-                    result = "Unknown tool"
-                tool_results.append(
-                    ToolMessage(content=result, tool_call_id=tool_call["id"])
-                )
+                sources.append({"tool": tool_call["name"], "input": tool_call["args"]})
+
+            if len(ai_msg.tool_calls) == 1:
+                # A single call runs inline on the request's own session.
+                tool_call = ai_msg.tool_calls[0]
+                contents = [_run_tool(tool_call["name"], tool_call["args"])]
+            else:
+                # Dispatch all tool calls at once; results are collected in
+                # call order so each ToolMessage lines up with its tool_call_id.
+                now = _now()
+                futures = [
+                    tool_executor.submit(
+                        _run_tool, tool_call["name"], tool_call["args"], now
+                    )
+                    for tool_call in ai_msg.tool_calls
+                ]
+                contents = [
+                    future.result(timeout=config.TOOL_CALL_TIMEOUT_SECONDS)
+                    for future in futures
+                ]
+
+            tool_results = [
+                ToolMessage(content=content, tool_call_id=tool_call["id"])
+                for tool_call, content in zip(ai_msg.tool_calls, contents)
+            ]
 
             # Call again with tool results
             messages = messages + [ai_msg] + tool_results
@@ -197,59 +276,56 @@ def get_qa_agent(request: schemas.AskRequest) -> schemas.AskResponse:
         else:
             answer = ai_msg.content
 
-        return schemas.AskResponse(answer=answer, sources=sources)
+        response = schemas.AskResponse(answer=answer, sources=sources)
+        ask_cache.set(cache_key, response, ttl=config.ASK_CACHE_TTL_SECONDS)
+        return response
     except Exception as e:
         return schemas.AskResponse(
             answer=f"Error processing question: {str(e)}", sources=[]
         )
+    finally:
+        request_now.reset(token)
+
+
+def _ask_cache_key(request: schemas.AskRequest) -> tuple:
+    """Helper to build the /ask cache key from the normalized question and scope."""
+    question = " ".join(re.sub(r"[^\w\s]", " ", request.question.lower()).split())
+    return (question, request.asset_id, request.window_minutes)
 
 
 def _build_summary_context(
-    anomalies: List[schemas.AnomalyRecordInDB],
-    telemetry: List[schemas.TelemetryEventInDB],
+    anomalies: List[tuple],
+    metric_stats: List[tuple],
 ) -> str:
-    """Helper to format data into a string for the summary prompt."""
-    context_str = "Context for Asset Health Summary:\n\n"
+    """
+    Helper to format data into a string for the summary prompt.
+    anomalies holds rows from crud.get_anomalies_by_asset_rows and
+    metric_stats holds (metric, count, avg, min, max) rows per metric.
+    """
+    parts = ["Context for Asset Health Summary:\n\n"]
 
     if anomalies:
-        context_str += "1. Recent Anomalies:\n"
-        for anom in anomalies[:5]:  # Limit to 5 most recent anomalies
-            context_str += (
+        parts.append("1. Recent Anomalies:\n")
+        for anom in anomalies:
+            parts.append(
                 f"- At {anom.timestamp.strftime('%H:%M:%S')}: {anom.explanation}\n"
             )
     else:
-        context_str += "1. No anomalies detected in this window.\n"
-
-    context_str += "\n2. Telemetry Overview:\n"
+        parts.append("1. No anomalies detected in this window.\n")
 
-    # Aggregate telemetry by metric
-    metrics_agg = {}
-    for event in telemetry:
-        if event.metric not in metrics_agg:
-            metrics_agg[event.metric] = []
-        metrics_agg[event.metric].append(event.value)
+    parts.append("\n2. Telemetry Overview:\n")
 
-    if not metrics_agg:
-        context_str += "No telemetry data available.\n"
+    if not metric_stats:
+        parts.append("No telemetry data available.\n")
     else:
-        for metric, values in metrics_agg.items():
-            context_str += (
+        for metric, count, avg, min_value, max_value in metric_stats:
+            parts.append(
                 f"- Metric '{metric}': "
-                f"{len(values)} data points, "
-                f"Avg: {np.mean(values):.2f}, "
-                f"Min: {min(values):.2f}, "
-                f"Max: {max(values):.2f}\n"
+                f"{count} data points, "
+                f"Avg: {avg:.2f}, "
+                f"Min: {min_value:.2f}, "
+                f"Max: {max_value:.2f}\n"
             )
 
-    return context_str
+    return "".join(parts)
 
-
-def _build_qa_context(telemetry: List[schemas.TelemetryEventInDB]) -> str:
-    """Helper to format data into a string for the Q&A prompt."""
-    context_str = "Context Telemetry Data:\n"
-    for event in telemetry:
-        context_str += (
-            f"- telemetry(metric='{event.metric}', value={event.value}, unit='{event.unit}', "
-            f"timestamp='{event.timestamp.isoformat()}', asset_id='{event.asset_id}')\n"
-        )
-    return context_str
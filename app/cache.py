@@ -0,0 +1,120 @@
+"""
+Caching helpers: an in-process TTL cache and the shared Redis client.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Hashable, Iterable, List, Optional
+
+import redis
+
+from . import config
+
+# Connections are opened lazily on first use, so importing this module
+# does not require Redis to be reachable.
+# Short timeouts keep an unreachable Redis from stalling callers on the
+# request path (ingest counting is best-effort).
+redis_client = redis.Redis.from_url(
+    config.REDIS_URL,
+    decode_responses=True,
+    socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT_SECONDS,
+    socket_timeout=config.REDIS_SOCKET_TIMEOUT_SECONDS,
+)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a per-entry TTL.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        """Stores a value for ttl seconds, evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+# --- Ingest counters ---
+# Events ingested per (asset, metric), bucketed by event time at the schedule
+# interval, so the scheduler can skip pairs too sparse to score without
+# touching the database.
+
+
+def _count_key(asset_id: str, metric: str, bucket: int) -> str:
+    return f"count:{asset_id}:{metric}:{bucket}"
+
+
+def _bucket(ts: datetime) -> int:
+    return int(ts.timestamp()) // config.ANOMALY_SCHEDULE_INTERVAL_SECONDS
+
+
+def record_ingest_counts(events: Iterable) -> None:
+    """
+    Increments the per-bucket event counters for a batch of ingested events.
+    Counting is best-effort: Redis errors are ignored.
+    """
+    counts = Counter((e.asset_id, e.metric, _bucket(e.timestamp)) for e in events)
+    # Keep a bucket until it has slid out of the detection window
+    ttl = config.ANOMALY_WINDOW_SIZE_SECONDS + 2 * config.ANOMALY_SCHEDULE_INTERVAL_SECONDS
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for (asset_id, metric, bucket), n in counts.items():
+            key = _count_key(asset_id, metric, bucket)
+            pipe.incrby(key, n)
+            pipe.expire(key, ttl)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+
+def recent_event_counts(
+    pairs: List[dict], start: datetime, end: datetime
+) -> Optional[List[Optional[int]]]:
+    """
+    Returns the number of events counted for each {"asset_id", "metric"} pair
+    in the buckets spanning [start, end], from a single MGET. The count may
+    include up to one interval before start. A pair with no counter keys at
+    all gets None rather than 0: its events may simply not have been counted
+    (a failed increment, a flushed Redis, or rows written outside /ingest).
+    Returns None if Redis is unavailable, so callers can fail open.
+    """
+    buckets = range(_bucket(start), _bucket(end) + 1)
+    keys = [
+        _count_key(pair["asset_id"], pair["metric"], bucket)
+        for pair in pairs
+        for bucket in buckets
+    ]
+    if not keys:
+        return []
+    try:
+        values = redis_client.mget(keys)
+    except redis.RedisError:
+        return None
+    per_pair = len(buckets)
+    counts = []
+    for i in range(0, len(values), per_pair):
+        present = [int(v) for v in values[i : i + per_pair] if v is not None]
+        counts.append(sum(present) if present else None)
+    return counts
@@ -1,9 +1,16 @@
 from celery.schedules import crontab
 
+from . import config
+from .schedules import jittered_schedule
+
 # Celery Beat schedule
 beat_schedule = {
     'run-anomaly-detection-every-30-seconds': {
         'task': 'app.worker.run_anomaly_detection',
-        'schedule': 30.0,  # Every 30 seconds
+        # Every 30 seconds by default, give or take the configured jitter
+        'schedule': jittered_schedule(
+            config.ANOMALY_SCHEDULE_INTERVAL_SECONDS,
+            jitter_seconds=config.ANOMALY_SCHEDULE_JITTER_SECONDS,
+        ),
     },
 }
\ No newline at end of file
@@ -20,15 +20,50 @@ DATABASE_URL = (
     f"{DATABASE_HOST}:{DATABASE_PORT}/{POSTGRES_DB}"
 )
 
+# Connection pool sizing (shared by the API and the Celery worker)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 40))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+
+# --- API Configuration ---
+# /metrics is scraped at a fixed interval; serve repeated scrapes from cache
+METRICS_CACHE_TTL_SECONDS = float(os.getenv("METRICS_CACHE_TTL_SECONDS", 5))
+# Largest gzip-encoded request body accepted once inflated (guards against
+# compression bombs)
+INGEST_MAX_DECOMPRESSED_BYTES = int(
+    os.getenv("INGEST_MAX_DECOMPRESSED_BYTES", 64 * 1024 * 1024)
+)
+
 # --- Celery Configuration ---
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
 
+# Redis used for shared caches (e.g. anomaly window statistics)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Connect/read timeout for that client, so an unreachable Redis fails fast
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", 0.5))
+
 # --- Anomaly Detection Configuration ---
 ANOMALY_Z_SCORE_THRESHOLD = float(os.getenv("ANOMALY_Z_SCORE_THRESHOLD", 2.0))
 ANOMALY_WINDOW_SIZE_SECONDS = int(
     os.getenv("ANOMALY_WINDOW_SIZE_SECONDS", 600)
 )  # 10 minutes
+# "python" scores windows in the worker with NumPy; "sql" scores and inserts
+# them inside Postgres without transferring the event rows.
+ANOMALY_DETECTION_BACKEND = os.getenv("ANOMALY_DETECTION_BACKEND", "python")
+# Scoring for the "python" backend: "mad" uses the modified z-score (median
+# and median absolute deviation), which outliers cannot inflate; "zscore"
+# uses mean and standard deviation, updated incrementally between runs.
+ANOMALY_DETECTION_METHOD = os.getenv("ANOMALY_DETECTION_METHOD", "mad")
+# How often beat schedules a detection run across all assets
+ANOMALY_SCHEDULE_INTERVAL_SECONDS = int(
+    os.getenv("ANOMALY_SCHEDULE_INTERVAL_SECONDS", 30)
+)
+# Each run fires up to this many seconds early or late, so beat instances
+# started together do not hit the database on the same tick
+ANOMALY_SCHEDULE_JITTER_SECONDS = float(
+    os.getenv("ANOMALY_SCHEDULE_JITTER_SECONDS", 5)
+)
 
 # --- LangChain/Agent Configuration ---
 # Google API Key for Gemini
@@ -41,5 +76,27 @@ LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google_genai")
 # Model name for Google Generative AI
 LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gemini-2.5-flash")
 
+# Keep-alive pool for the Gemini HTTP client
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 32))
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", 16)
+)
+LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS = float(
+    os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", 60)
+)
+
 # Summary window in minutes
 SUMMARY_WINDOW_MINUTES = int(os.getenv("SUMMARY_WINDOW_MINUTES", 60))
+
+# Maximum number of cached summaries (keyed by the exact prompt context)
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", 1024))
+
+# Cache for /ask answers, keyed by the normalized question and asset scope
+ASK_CACHE_TTL_SECONDS = int(os.getenv("ASK_CACHE_TTL_SECONDS", 30))
+ASK_CACHE_MAX_ENTRIES = int(os.getenv("ASK_CACHE_MAX_ENTRIES", 10000))
+
+# Thread pool used to run the agent's tool calls concurrently
+TOOL_EXECUTOR_MAX_WORKERS = int(os.getenv("TOOL_EXECUTOR_MAX_WORKERS", 8))
+
+# Maximum seconds to wait on a single tool call
+TOOL_CALL_TIMEOUT_SECONDS = float(os.getenv("TOOL_CALL_TIMEOUT_SECONDS", 30))
@@ -2,10 +2,14 @@
 CRUD (Create, Read, Update, Delete) operations for the database.
 """
 
+from psycopg2.extras import execute_values
+from sqlalchemy import Row, func, insert, select, text
 from sqlalchemy.orm import Session
 from . import models, schemas
+from .db import json_serializer
 from typing import List, Optional
 from datetime import datetime
+import uuid
 
 
 def create_telemetry_events(
@@ -13,26 +17,28 @@ def create_telemetry_events(
 ) -> int:
     """
     Inserts a list of telemetry events into the database.
+    Uses a single Core INSERT so the driver batches rows into multi-VALUES
+    statements instead of going through ORM unit-of-work bookkeeping.
     """
-    import json
-
-    db_events = [
-        models.TelemetryEvent(
-            asset_id=event.asset_id,
-            timestamp=event.timestamp,
-            metric=event.metric,
-            value=event.value,
-            unit=event.unit,
-            tags=event.tags,
-            raw_payload=json.dumps(event.model_dump(mode="json")),
-        )
+    rows = [
+        {
+            "asset_id": event.asset_id,
+            "timestamp": event.timestamp,
+            "metric": event.metric,
+            "value": event.value,
+            "unit": event.unit,
+            "tags": event.tags,
+            # Stored as a JSON object; the JSONB type serializes it once.
+            "raw_payload": event.model_dump(mode="json", exclude={"raw_payload"}),
+        }
         for event in events
     ]
-    db.add_all(db_events)
+    if not rows:
+        return 0
+    db.execute(insert(models.TelemetryEvent), rows)
     db.commit()
     # Return the number of events successfully added.
-    # In a real app, you might return the actual objects or their IDs.
-    return len(db_events)
+    return len(rows)
 
 
 def get_telemetry_events_by_metric(
@@ -54,6 +60,51 @@ def get_telemetry_events_by_metric(
     )
 
 
+def get_telemetry_values_by_metric(
+    db: Session, asset_id: str, metric: str, start_time: datetime, end_time: datetime
+) -> List[Row]:
+    """
+    Retrieves (id, value, timestamp) rows for a specific metric and time window,
+    ordered by time. Used by anomaly detection, which needs no other columns.
+    """
+    stmt = (
+        select(
+            models.TelemetryEvent.id,
+            models.TelemetryEvent.value,
+            models.TelemetryEvent.timestamp,
+        )
+        .where(
+            models.TelemetryEvent.asset_id == asset_id,
+            models.TelemetryEvent.metric == metric,
+            models.TelemetryEvent.timestamp >= start_time,
+            models.TelemetryEvent.timestamp <= end_time,
+        )
+        .order_by(models.TelemetryEvent.timestamp.asc())
+    )
+    return db.execute(stmt).all()
+
+
+def get_window_summary(
+    db: Session, asset_id: str, metric: str, start_time: datetime, end_time: datetime
+) -> tuple:
+    """
+    Returns (count, min, max) of a metric's values in a time window, so callers
+    can rule out sparse or flat windows without fetching the rows.
+    """
+    return db.execute(
+        select(
+            func.count(),
+            func.min(models.TelemetryEvent.value),
+            func.max(models.TelemetryEvent.value),
+        ).where(
+            models.TelemetryEvent.asset_id == asset_id,
+            models.TelemetryEvent.metric == metric,
+            models.TelemetryEvent.timestamp >= start_time,
+            models.TelemetryEvent.timestamp <= end_time,
+        )
+    ).one()
+
+
 def create_anomaly_record(
     db: Session, anomaly: schemas.AnomalyRecordCreate
 ) -> models.AnomalyRecord:
@@ -76,51 +127,328 @@ def create_anomaly_record(
     return db_anomaly
 
 
+def bulk_create_anomaly_records(db: Session, rows: List[dict]) -> int:
+    """
+    Inserts a batch of anomaly records in one transaction, skipping any whose
+    telemetry_id already has an anomaly. Returns the number of rows inserted.
+    """
+    if not rows:
+        return 0
+
+    # One IN query instead of an existence check per record
+    telemetry_ids = [row["telemetry_id"] for row in rows]
+    existing = set(
+        db.scalars(
+            select(models.AnomalyRecord.telemetry_id).where(
+                models.AnomalyRecord.telemetry_id.in_(telemetry_ids)
+            )
+        )
+    )
+    new_rows = [row for row in rows if row["telemetry_id"] not in existing]
+    if not new_rows:
+        return 0
+
+    values = [
+        (
+            str(uuid.uuid4()),
+            str(row["telemetry_id"]),
+            row["asset_id"],
+            row["timestamp"],
+            row["metric"],
+            row["score"],
+            row["explanation"],
+            json_serializer(row["details"]),
+        )
+        for row in new_rows
+    ]
+    try:
+        # execute_values folds the rows into multi-row VALUES statements, one
+        # parse/plan per page, on the session's own connection and transaction
+        with db.connection().connection.cursor() as cursor:
+            execute_values(
+                cursor,
+                "INSERT INTO anomaly_records "
+                "(id, telemetry_id, asset_id, timestamp, metric, score, explanation, details) "
+                "VALUES %s",
+                values,
+                template="(%s::uuid, %s::uuid, %s, %s, %s, %s, %s, %s::jsonb)",
+                page_size=1000,
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(new_rows)
+
+
+INSERT_ANOMALIES_SQL = text(
+    """
+    WITH w AS (
+        SELECT
+            id,
+            timestamp,
+            value,
+            AVG(value) OVER () AS mu,
+            STDDEV_POP(value) OVER () AS sigma,
+            COUNT(*) OVER () AS n
+        FROM telemetry_events
+        WHERE asset_id = :asset_id
+          AND metric = :metric
+          AND timestamp >= :window_start
+          AND timestamp <= :window_end
+    )
+    INSERT INTO anomaly_records
+        (id, telemetry_id, asset_id, timestamp, metric, score, explanation, details)
+    SELECT
+        gen_random_uuid(),
+        w.id,
+        :asset_id,
+        w.timestamp,
+        :metric,
+        ABS(w.value - w.mu) / w.sigma,
+        format(
+            'Anomaly detected for %s/%s: Value %s is %s standard deviations from the mean of %s.',
+            :asset_id,
+            :metric,
+            w.value,
+            ROUND((ABS(w.value - w.mu) / w.sigma)::numeric, 2),
+            ROUND(w.mu::numeric, 2)
+        ),
+        jsonb_build_object('mean', w.mu, 'std_dev', w.sigma, 'window_size', w.n)
+    FROM w
+    WHERE w.n >= :min_points
+      AND w.sigma > 0
+      AND ABS(w.value - w.mu) / w.sigma > :threshold
+      AND NOT EXISTS (
+          SELECT 1 FROM anomaly_records a WHERE a.telemetry_id = w.id
+      )
+    """
+)
+
+
+def insert_anomalies_sql(
+    db: Session,
+    asset_id: str,
+    metric: str,
+    window_start: datetime,
+    window_end: datetime,
+    threshold: float,
+    min_points: int = 10,
+) -> int:
+    """
+    Scores a window of telemetry and records its outliers entirely in Postgres.
+    Mean and standard deviation come from window functions and flagged rows
+    are inserted with INSERT ... SELECT, so no event rows leave the database.
+    Returns the number of new anomaly records.
+    """
+    result = db.execute(
+        INSERT_ANOMALIES_SQL,
+        {
+            "asset_id": asset_id,
+            "metric": metric,
+            "window_start": window_start,
+            "window_end": window_end,
+            "threshold": threshold,
+            "min_points": min_points,
+        },
+    )
+    db.commit()
+    return result.rowcount
+
+
 def get_anomalies_by_asset(
-    db: Session, asset_id: Optional[str], start_time: datetime, end_time: datetime
+    db: Session,
+    asset_id: Optional[str],
+    start_time: datetime,
+    end_time: Optional[datetime] = None,
+    limit: Optional[int] = None,
 ) -> List[models.AnomalyRecord]:
     """
-    Retrieves anomaly records for a specific asset (or all if None) and time window.
+    Retrieves anomaly records for a specific asset (or all if None) and time window,
+    newest first, optionally capped at the `limit` most recent records.
+    If end_time is None, the window ends at the database's NOW().
     """
     query = db.query(models.AnomalyRecord).filter(
         models.AnomalyRecord.timestamp >= start_time,
-        models.AnomalyRecord.timestamp <= end_time,
+        models.AnomalyRecord.timestamp <= (func.now() if end_time is None else end_time),
     )
     if asset_id:
         query = query.filter(models.AnomalyRecord.asset_id == asset_id)
-    return query.order_by(models.AnomalyRecord.timestamp.desc()).all()
+    query = query.order_by(models.AnomalyRecord.timestamp.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def get_anomalies_by_asset_rows(
+    db: Session,
+    asset_id: Optional[str],
+    start_time: datetime,
+    end_time: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[Row]:
+    """
+    Same filter as get_anomalies_by_asset, but returns lightweight
+    (asset_id, metric, score, timestamp, explanation) rows instead of ORM
+    entities, for read-only formatting paths.
+    """
+    stmt = select(
+        models.AnomalyRecord.asset_id,
+        models.AnomalyRecord.metric,
+        models.AnomalyRecord.score,
+        models.AnomalyRecord.timestamp,
+        models.AnomalyRecord.explanation,
+    ).where(
+        models.AnomalyRecord.timestamp >= start_time,
+        models.AnomalyRecord.timestamp <= (func.now() if end_time is None else end_time),
+    )
+    if asset_id:
+        stmt = stmt.where(models.AnomalyRecord.asset_id == asset_id)
+    stmt = stmt.order_by(models.AnomalyRecord.timestamp.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return db.execute(stmt).all()
+
 
+# Loose index scan: each step jumps to the next (asset_id, metric) pair on
+# ix_telemetry_asset_metric_ts, so the cost grows with the number of distinct
+# pairs rather than with the number of events.
+DISTINCT_ASSET_METRICS_SQL = """
+    WITH RECURSIVE pairs AS (
+        (
+            SELECT asset_id, metric FROM telemetry_events
+            ORDER BY asset_id, metric
+            LIMIT 1
+        )
+        UNION ALL
+        SELECT nxt.asset_id, nxt.metric
+        FROM pairs p
+        CROSS JOIN LATERAL (
+            SELECT t.asset_id, t.metric FROM telemetry_events t
+            WHERE (t.asset_id, t.metric) > (p.asset_id, p.metric)
+            ORDER BY t.asset_id, t.metric
+            LIMIT 1
+        ) nxt
+    )
+    SELECT asset_id, metric FROM pairs
+"""
 
-def get_unique_assets_and_metrics(db: Session) -> List[dict]:
+
+def get_unique_assets_and_metrics(
+    db: Session, since: Optional[datetime] = None
+) -> List[dict]:
     """
     Retrieves unique combinations of asset_id and metric from telemetry events.
+    If since is given, only pairs with at least one event at or after it are returned.
     """
-    results = (
-        db.query(models.TelemetryEvent.asset_id, models.TelemetryEvent.metric)
-        .distinct()
-        .all()
+    sql, params = DISTINCT_ASSET_METRICS_SQL, {}
+    if since is not None:
+        sql += """
+    WHERE EXISTS (
+        SELECT 1 FROM telemetry_events t
+        WHERE t.asset_id = pairs.asset_id
+          AND t.metric = pairs.metric
+          AND t.timestamp >= :since
     )
+"""
+        params["since"] = since
+    results = db.execute(text(sql), params).all()
     return [{"asset_id": row[0], "metric": row[1]} for row in results]
 
 
 def get_telemetry_for_agent(
-    db: Session, asset_id: str, start_time: datetime, end_time: datetime
+    db: Session,
+    asset_id: str,
+    start_time: datetime,
+    end_time: Optional[datetime] = None,
+    limit: int = 1000,
 ) -> List[models.TelemetryEvent]:
     """
-    Retrieves telemetry data for a given asset within a time window.
+    Retrieves telemetry data for a given asset within a time window, newest first.
     This function is optimized for agent retrieval, potentially sampling data if needed.
-    For now, it retrieves all data up to a limit to avoid overwhelming the LLM context.
+    For now, it retrieves the `limit` most recent events to avoid overwhelming the LLM context.
+    If end_time is None, the window ends at the database's NOW().
     """
     return (
         db.query(models.TelemetryEvent)
         .filter(
             models.TelemetryEvent.asset_id == asset_id,
             models.TelemetryEvent.timestamp >= start_time,
-            models.TelemetryEvent.timestamp <= end_time,
+            models.TelemetryEvent.timestamp
+            <= (func.now() if end_time is None else end_time),
         )
         .order_by(models.TelemetryEvent.timestamp.desc())
-        .limit(
-            1000
-        )  # Safeguard to prevent pulling too much data into the agent context
+        .limit(limit)  # Safeguard to prevent pulling too much data into the agent context
         .all()
     )
+
+
+def get_telemetry_aggregates_for_agent(
+    db: Session, asset_id: str, start_time: datetime, end_time: datetime
+) -> List[tuple]:
+    """
+    Retrieves per-metric (metric, count, avg, min, max) for an asset and time window.
+    The aggregation runs in the database so only one row per metric is transferred.
+    """
+    return (
+        db.query(
+            models.TelemetryEvent.metric,
+            func.count(models.TelemetryEvent.id),
+            func.avg(models.TelemetryEvent.value),
+            func.min(models.TelemetryEvent.value),
+            func.max(models.TelemetryEvent.value),
+        )
+        .filter(
+            models.TelemetryEvent.asset_id == asset_id,
+            models.TelemetryEvent.timestamp >= start_time,
+            models.TelemetryEvent.timestamp <= end_time,
+        )
+        .group_by(models.TelemetryEvent.metric)
+        .order_by(models.TelemetryEvent.metric)
+        .all()
+    )
+
+
+SYSTEM_METRICS_SQL = text(
+    """
+    WITH te AS (
+        SELECT asset_id, COUNT(*) AS c FROM telemetry_events GROUP BY asset_id
+    ),
+    ar AS (
+        SELECT asset_id, COUNT(*) AS c FROM anomaly_records GROUP BY asset_id
+    )
+    SELECT
+        (SELECT COALESCE(SUM(c), 0) FROM te)::bigint,
+        (SELECT COALESCE(SUM(c), 0) FROM ar)::bigint,
+        (
+            SELECT COALESCE(
+                json_agg(json_build_object('asset_id', asset_id, 'count', c) ORDER BY c DESC),
+                '[]'::json
+            )
+            FROM (SELECT asset_id, c FROM te ORDER BY c DESC LIMIT 10) AS top
+        ),
+        (
+            SELECT COALESCE(
+                json_agg(json_build_object('asset_id', asset_id, 'count', c) ORDER BY c DESC),
+                '[]'::json
+            )
+            FROM (SELECT asset_id, c FROM ar ORDER BY c DESC LIMIT 10) AS top
+        )
+    """
+)
+
+
+def get_system_metrics(db: Session) -> dict:
+    """
+    Retrieves total event/anomaly counts and the top 10 assets by each.
+    Each table is scanned once and everything returns in a single round-trip.
+    """
+    total_events, total_anomalies, top_events, top_anomalies = db.execute(
+        SYSTEM_METRICS_SQL
+    ).one()
+    return {
+        "total_telemetry_events": total_events,
+        "total_anomaly_records": total_anomalies,
+        "top_assets_by_events": top_events,
+        "top_assets_by_anomalies": top_anomalies,
+    }
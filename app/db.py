@@ -2,13 +2,39 @@
 Database connection and session management.
 """
 
+from contextlib import contextmanager
+from contextvars import ContextVar
+import orjson
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from . import config
 
-engine = create_engine(config.DATABASE_URL, pool_pre_ping=True)
+
+def json_serializer(obj) -> str:
+    # orjson returns bytes; the driver expects str. Anomaly details carry
+    # numpy floats, which orjson only accepts with OPT_SERIALIZE_NUMPY.
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+# Stale connections are retired by pool_recycle rather than a pre-ping, which
+# would add a round-trip to every checkout.
+engine = create_engine(
+    config.DATABASE_URL,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_recycle=config.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=False,
+    connect_args={"options": "-c jit=off", "application_name": "telemetry"},
+    # JSON/JSONB columns (tags, raw_payload, details) go through orjson
+    json_serializer=json_serializer,
+    json_deserializer=orjson.loads,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Session bound to the current API request, so agent tools invoked while
+# serving it share one connection instead of checking out their own.
+current_session: ContextVar[Session] = ContextVar("current_session")
+
 
 def get_db():
     db = SessionLocal()
@@ -16,3 +42,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def session_scope():
+    """
+    Yields the request-scoped session if one is bound, otherwise a new
+    session that is closed on exit.
+    """
+    db = current_session.get(None)
+    if db is not None:
+        yield db
+        return
+
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -2,12 +2,16 @@
 Main FastAPI application.
 """
 
-from fastapi import FastAPI, Depends, HTTPException, Query
+import asyncio
+import zlib
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 
-from . import crud, models, schemas, db
+from . import crud, models, schemas, db, config
+from .cache import TTLCache, record_ingest_counts
 
 # Create all tables in the database.
 # In a production app, you might want to use Alembic for migrations.
@@ -19,9 +23,77 @@ app = FastAPI(
     version="0.1.0",
 )
 
+metrics_cache = TTLCache(maxsize=1)
+
+
+def _gunzip(data: bytes, max_size: int) -> bytes:
+    """
+    Inflates a gzip body (one or more members) without ever producing more
+    than max_size bytes. Raises 413 past the limit and 400 for malformed or
+    truncated input.
+    """
+    out = []
+    size = 0
+    try:
+        while data:
+            decompressor = zlib.decompressobj(wbits=31)
+            # One byte over the remaining budget is enough to detect overflow
+            chunk = decompressor.decompress(data, max_size - size + 1)
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Decompressed body exceeds {max_size} bytes",
+                )
+            if not decompressor.eof:
+                raise HTTPException(status_code=400, detail="Truncated gzip body")
+            out.append(chunk)
+            data = decompressor.unused_data
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+    return b"".join(out)
+
+
+class GzipRequest(Request):
+    """
+    Request whose body is transparently decompressed when the client sent it
+    with Content-Encoding: gzip.
+    """
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if "gzip" in self.headers.getlist("Content-Encoding"):
+                # Large batches would block the event loop while inflating
+                body = await asyncio.to_thread(
+                    _gunzip, body, config.INGEST_MAX_DECOMPRESSED_BYTES
+                )
+            self._body = body
+        return self._body
+
+
+class GzipRoute(APIRoute):
+    """
+    Route that hands its endpoint a GzipRequest, so /ingest accepts compressed
+    telemetry batches.
+    """
+
+    def get_route_handler(self):
+        original_route_handler = super().get_route_handler()
+
+        async def gzip_route_handler(request: Request) -> Response:
+            request = GzipRequest(request.scope, request.receive)
+            return await original_route_handler(request)
+
+        return gzip_route_handler
+
+
+# Must be set before the routes below are registered
+app.router.route_class = GzipRoute
+
 
 @app.post("/ingest", response_model=schemas.TelemetryIngestResponse, status_code=200)
-def ingest_telemetry(
+async def ingest_telemetry(
     request: schemas.TelemetryIngestRequest, database: Session = Depends(db.get_db)
 ):
     """
@@ -40,9 +112,10 @@ def ingest_telemetry(
             for event in request.events
         ]
 
-        num_ingested = crud.create_telemetry_events(
-            db=database, events=events_to_create
+        num_ingested = await asyncio.to_thread(
+            crud.create_telemetry_events, db=database, events=events_to_create
         )
+        await asyncio.to_thread(record_ingest_counts, request.events)
         return schemas.TelemetryIngestResponse(ingested=num_ingested)
     except Exception as e:
         # In a real app, log the exception details
@@ -50,39 +123,49 @@ def ingest_telemetry(
 
 
 @app.get("/summary", response_model=schemas.SummaryResponse)
-def get_summary(
+async def get_summary(
     asset_id: str, window_minutes: int = 60, database: Session = Depends(db.get_db)
 ):
     """
     Runs RAG retrieval and returns an AI-generated health summary.
     """
+    token = db.current_session.set(database)
     try:
         from . import agent
 
-        return agent.get_summary_agent(asset_id, window_minutes)
+        # to_thread copies the current context, so the bound session is
+        # visible to the agent running in the worker thread.
+        return await asyncio.to_thread(
+            agent.get_summary_agent, asset_id, window_minutes
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to generate summary: {str(e)}"
         )
+    finally:
+        db.current_session.reset(token)
 
 
 @app.post("/ask", response_model=schemas.AskResponse)
-def ask_agent(request: schemas.AskRequest, database: Session = Depends(db.get_db)):
+async def ask_agent(request: schemas.AskRequest, database: Session = Depends(db.get_db)):
     """
     Natural language Q&A over telemetry data.
     """
+    token = db.current_session.set(database)
     try:
         from . import agent
 
-        return agent.get_qa_agent(request)
+        return await asyncio.to_thread(agent.get_qa_agent, request)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to answer question: {str(e)}"
         )
+    finally:
+        db.current_session.reset(token)
 
 
 @app.get("/anomalies", response_model=List[schemas.AnomalyRecordInDB])
-def get_anomalies(
+async def get_anomalies(
     asset_id: str,
     since: datetime,
     until: Optional[datetime] = None,
@@ -98,13 +181,13 @@ def get_anomalies(
         if since.tzinfo is None:
             since = since.replace(tzinfo=timezone.utc)
         
-        # Default until to current time (timezone-aware)
-        if until is None:
-            until = datetime.now(timezone.utc)
-        elif until.tzinfo is None:
+        # An open-ended range is bounded by the database's NOW()
+        if until is not None and until.tzinfo is None:
             until = until.replace(tzinfo=timezone.utc)
         
-        anomalies = crud.get_anomalies_by_asset(database, asset_id, since, until)
+        anomalies = await asyncio.to_thread(
+            crud.get_anomalies_by_asset, database, asset_id, since, until
+        )
         return anomalies
     except Exception as e:
         raise HTTPException(
@@ -113,54 +196,16 @@ def get_anomalies(
 
 
 @app.get("/metrics")
-def get_metrics(database: Session = Depends(db.get_db)):
+async def get_metrics(database: Session = Depends(db.get_db)):
     """
     Exposes application metrics for monitoring.
     """
     try:
-        from sqlalchemy import func
-        from . import models
-
-        # Get total telemetry events count
-        total_events = database.query(func.count(models.TelemetryEvent.id)).scalar()
-
-        # Get total anomaly records count
-        total_anomalies = database.query(func.count(models.AnomalyRecord.id)).scalar()
-
-        # Get events by asset (top 10)
-        events_by_asset = (
-            database.query(
-                models.TelemetryEvent.asset_id,
-                func.count(models.TelemetryEvent.id).label("count"),
-            )
-            .group_by(models.TelemetryEvent.asset_id)
-            .order_by(func.count(models.TelemetryEvent.id).desc())
-            .limit(10)
-            .all()
-        )
-
-        # Get anomalies by asset (top 10)
-        anomalies_by_asset = (
-            database.query(
-                models.AnomalyRecord.asset_id,
-                func.count(models.AnomalyRecord.id).label("count"),
-            )
-            .group_by(models.AnomalyRecord.asset_id)
-            .order_by(func.count(models.AnomalyRecord.id).desc())
-            .limit(10)
-            .all()
-        )
-
-        return {
-            "total_telemetry_events": total_events,
-            "total_anomaly_records": total_anomalies,
-            "top_assets_by_events": [
-                {"asset_id": a, "count": c} for a, c in events_by_asset
-            ],
-            "top_assets_by_anomalies": [
-                {"asset_id": a, "count": c} for a, c in anomalies_by_asset
-            ],
-        }
+        metrics = metrics_cache.get("metrics")
+        if metrics is None:
+            metrics = await asyncio.to_thread(crud.get_system_metrics, database)
+            metrics_cache.set("metrics", metrics, ttl=config.METRICS_CACHE_TTL_SECONDS)
+        return metrics
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to fetch metrics: {str(e)}"
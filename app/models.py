@@ -8,8 +8,10 @@ from sqlalchemy import (
     String,
     TIMESTAMP,
     Float,
+    REAL,
     Text,
     ForeignKey,
+    Index,
 )
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.ext.declarative import declarative_base
@@ -19,12 +21,17 @@ Base = declarative_base()
 
 class TelemetryEvent(Base):
     __tablename__ = "telemetry_events"
+    __table_args__ = (
+        Index("ix_telemetry_asset_ts", "asset_id", "timestamp"),
+        Index("ix_telemetry_asset_metric_ts", "asset_id", "metric", "timestamp"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    asset_id = Column(String, nullable=False, index=True)
+    asset_id = Column(String, nullable=False)
     timestamp = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
     metric = Column(String, nullable=False)
-    value = Column(Float, nullable=False)
+    # Sensor readings don't carry more than single precision
+    value = Column(REAL, nullable=False)
     unit = Column(String)
     tags = Column(JSONB)
     raw_payload = Column(JSONB)
@@ -32,10 +39,11 @@ class TelemetryEvent(Base):
 
 class AnomalyRecord(Base):
     __tablename__ = "anomaly_records"
+    __table_args__ = (Index("ix_anomaly_asset_ts", "asset_id", "timestamp"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     telemetry_id = Column(UUID(as_uuid=True), ForeignKey("telemetry_events.id"))
-    asset_id = Column(String, nullable=False, index=True)
+    asset_id = Column(String, nullable=False)
     timestamp = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
     metric = Column(String, nullable=False)
     score = Column(Float, nullable=False)
@@ -0,0 +1,48 @@
+"""
+Custom Celery Beat schedules.
+"""
+
+import random
+from datetime import timedelta
+
+from celery.schedules import schedule, schedstate
+
+
+class jittered_schedule(schedule):
+    """
+    Fixed-interval schedule whose every run is shifted by a random offset in
+    [-jitter, +jitter] seconds. The offset is drawn once per run, not on
+    every beat tick, so repeated checks do not pull the run earlier.
+    """
+
+    def __init__(
+        self, run_every, jitter_seconds=0, relative=False, nowfun=None, app=None
+    ):
+        super().__init__(run_every, relative=relative, nowfun=nowfun, app=app)
+        # Keep runs strictly ordered even if jitter exceeds half the interval
+        self.jitter_seconds = min(jitter_seconds, self.seconds / 2)
+        self._last_run_at = None
+        self._offset = timedelta(0)
+
+    def remaining_estimate(self, last_run_at):
+        if last_run_at != self._last_run_at:
+            self._last_run_at = last_run_at
+            self._offset = timedelta(
+                seconds=random.uniform(-self.jitter_seconds, self.jitter_seconds)
+            )
+        return super().remaining_estimate(last_run_at) + self._offset
+
+    def is_due(self, last_run_at):
+        due, next_check = super().is_due(last_run_at)
+        if due:
+            # The next run may come up to jitter_seconds early
+            next_check = self.seconds - self.jitter_seconds
+        return schedstate(is_due=due, next=next_check)
+
+    def __reduce__(self):
+        return self.__class__, (
+            self.run_every, self.jitter_seconds, self.relative, self.nowfun
+        )
+
+    def __repr__(self):
+        return f"<jittered freq: {self.human_seconds} ± {self.jitter_seconds:g}s>"
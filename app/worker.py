@@ -2,15 +2,29 @@
 Celery worker for background tasks like anomaly detection.
 """
 
-from celery import Celery
-from sqlalchemy.orm import Session
+from celery import Celery, group
+from celery.signals import worker_process_init
+from celery.utils.log import get_task_logger
+from sqlalchemy.orm import Session, scoped_session
 from datetime import datetime, timedelta
+from typing import Optional
+import math
 import numpy as np
 import os
+import redis
 from datetime import timezone
 
 from . import config, models, schemas, crud
-from .db import SessionLocal
+from .cache import recent_event_counts, redis_client
+from .db import SessionLocal, engine
+
+__all__ = ["celery_app", "detect_anomalies", "run_anomaly_detection"]
+
+logger = get_task_logger(__name__)
+
+# Scales the MAD to estimate the standard deviation of normally distributed
+# data, so the modified z-score (Iglewicz & Hoaglin) shares the z threshold.
+MAD_NORMAL_CONSISTENCY = 0.6745
 
 celery_app = Celery(
     "worker", broker=config.CELERY_BROKER_URL, backend=config.CELERY_RESULT_BACKEND
@@ -20,70 +34,344 @@ celery_app.config_from_object("app.celeryconfig")
 # Configure pool for Windows compatibility
 celery_app.conf.update(worker_pool="solo" if os.name == "nt" else "prefork")
 
+# One session per worker thread, reused across the tasks it runs; remove()
+# at the end of each task returns its connection to the engine's pool.
+WorkerSession = scoped_session(SessionLocal)
+
+
+@worker_process_init.connect
+def _init_worker_process(**kwargs):
+    """
+    Prefork children inherit the parent's pooled connections, which must not
+    be shared across processes. Drop them so each child builds its own pool.
+    """
+    engine.dispose(close=False)
+
 
 @celery_app.task(name="app.worker.detect_anomalies")
 def detect_anomalies(asset_id: str, metric: str):
     """
     Analyzes recent telemetry for a given asset and metric to detect anomalies.
+
+    With the "zscore" method the window statistics are maintained
+    incrementally and are approximate: a row that arrives after a run with a
+    timestamp behind that run's high-water mark is never added, but is still
+    subtracted when it expires. The drift is bounded by the full rebuild done
+    once per window, and a removal that leaves impossible statistics forces
+    an immediate rebuild.
     """
-    db: Session = SessionLocal()
+    db: Session = WorkerSession()
     try:
         window_end = datetime.now(timezone.utc)
         window_start = window_end - timedelta(
             seconds=config.ANOMALY_WINDOW_SIZE_SECONDS
         )
 
-        events = crud.get_telemetry_events_by_metric(
-            db,
-            asset_id=asset_id,
-            metric=metric,
-            start_time=window_start,
-            end_time=window_end,
-        )
-
-        if len(events) < 10:  # Need a minimum number of data points
-            return f"Not enough data points for {asset_id}/{metric} in the last window."
+        if config.ANOMALY_DETECTION_BACKEND == "sql":
+            inserted = crud.insert_anomalies_sql(
+                db,
+                asset_id=asset_id,
+                metric=metric,
+                window_start=window_start,
+                window_end=window_end,
+                threshold=config.ANOMALY_Z_SCORE_THRESHOLD,
+            )
+            return f"Recorded {inserted} new anomalies for {asset_id}/{metric}."
 
-        values = np.array([event.value for event in events])
-        mean = np.mean(values)
-        std_dev = np.std(values)
+        if config.ANOMALY_DETECTION_METHOD == "mad":
+            # The median can't be updated incrementally, so each run scores
+            # the full window.
+            skip_reason = _precheck_window(db, asset_id, metric, window_start, window_end)
+            if skip_reason:
+                return skip_reason
+            rows = crud.get_telemetry_values_by_metric(
+                db,
+                asset_id=asset_id,
+                metric=metric,
+                start_time=window_start,
+                end_time=window_end,
+            )
+            values = _values(rows)
+            n = len(values)
 
-        if std_dev == 0:  # Avoid division by zero
-            return f"Standard deviation is zero for {asset_id}/{metric}."
+            if n < 10:  # Need a minimum number of data points
+                return f"Not enough data points for {asset_id}/{metric} in the last window."
 
-        anomalies_detected = []
-        for event in events:
-            z_score = (event.value - mean) / std_dev
-            if abs(z_score) > config.ANOMALY_Z_SCORE_THRESHOLD:
-                explanation = (
-                    f"Anomaly detected for {asset_id}/{metric}: "
-                    f"Value {event.value} is {abs(z_score):.2f} standard deviations from the mean of {mean:.2f}."
+            median, mad = _median_mad(values)
+            if mad > 0:
+                center, scale = median, mad / MAD_NORMAL_CONSISTENCY
+                describe = "robust standard deviations from the median"
+                details = {"median": median, "mad": mad, "window_size": n}
+            else:
+                # Most of the window shares one value; fall back to the std
+                n, center, m2 = _batch_stats(values)
+                scale = math.sqrt(m2 / n)
+                describe = "standard deviations from the mean"
+                details = {"mean": center, "std_dev": scale, "window_size": n}
+        else:
+            bucket = int(window_end.timestamp()) // config.ANOMALY_SCHEDULE_INTERVAL_SECONDS
+            cached = _load_window_stats(asset_id, metric, bucket)
+            stats = None
+            if cached is not None:
+                # Consecutive windows overlap almost entirely: only read the rows
+                # that expired from the front and the rows appended since the
+                # last run, and fold them into the cached statistics.
+                prev_start = datetime.fromisoformat(cached["start"])
+                last_ts = datetime.fromisoformat(cached["last_ts"])
+                stats = (int(cached["n"]), float(cached["mean"]), float(cached["m2"]))
+                if prev_start < window_start:
+                    expired = [
+                        row
+                        for row in crud.get_telemetry_values_by_metric(
+                            db, asset_id, metric, prev_start, window_start
+                        )
+                        if row.timestamp < window_start
+                    ]
+                    # None if the expired rows can't have been in the cached
+                    # window; fall through to a full recompute
+                    stats = _remove_stats(stats, _batch_stats(_values(expired)))
+            if stats is not None:
+                rows = [
+                    row
+                    for row in crud.get_telemetry_values_by_metric(
+                        db, asset_id, metric, last_ts, window_end
+                    )
+                    if row.timestamp > last_ts
+                ]
+                values = _values(rows)
+                stats = _merge_stats(stats, _batch_stats(values))
+                age = int(cached["age"]) + 1
+                incremental = True
+            else:
+                skip_reason = _precheck_window(
+                    db, asset_id, metric, window_start, window_end
                 )
-                anomaly_record = schemas.AnomalyRecordCreate(
-                    telemetry_id=event.id,
+                if skip_reason:
+                    return skip_reason
+                last_ts = window_start
+                rows = crud.get_telemetry_values_by_metric(
+                    db,
                     asset_id=asset_id,
-                    timestamp=event.timestamp,
                     metric=metric,
-                    score=abs(z_score),
-                    explanation=explanation,
-                    details={
-                        "mean": mean,
-                        "std_dev": std_dev,
-                        "window_size": len(values),
-                    },
+                    start_time=window_start,
+                    end_time=window_end,
                 )
-                crud.create_anomaly_record(db, anomaly_record)
-                anomalies_detected.append(explanation)
+                values = _values(rows)
+                stats = _batch_stats(values)
+                age = 0
+                incremental = False
+
+            n, center, m2 = stats
+            if rows:
+                last_ts = rows[-1].timestamp
+            _store_window_stats(asset_id, metric, bucket, stats, window_start, last_ts, age)
 
-        if anomalies_detected:
-            return (
-                f"Detected {len(anomalies_detected)} anomalies for {asset_id}/{metric}."
+            if incremental and not rows:
+                return f"No new telemetry for {asset_id}/{metric} since the last run."
+
+            if n < 10:  # Need a minimum number of data points
+                return f"Not enough data points for {asset_id}/{metric} in the last window."
+
+            scale = math.sqrt(m2 / n)
+            describe = "standard deviations from the mean"
+            details = {"mean": center, "std_dev": scale, "window_size": n}
+
+        if scale == 0:  # Avoid division by zero
+            return f"Standard deviation is zero for {asset_id}/{metric}."
+
+        # Score the new rows (the whole window on a full pass) at once and
+        # only visit the flagged events
+        flagged, z_scores = _flag_outliers(
+            values, center, scale, config.ANOMALY_Z_SCORE_THRESHOLD
+        )
+
+        anomalies = []
+        for i, z_score in zip(flagged, z_scores.tolist()):
+            event = rows[i]
+            logger.debug(
+                "[anomaly] asset=%s metric=%s telemetry_id=%s value=%s score=%.2f",
+                asset_id, metric, event.id, event.value, z_score,
+            )
+            anomalies.append(
+                {
+                    "telemetry_id": event.id,
+                    "asset_id": asset_id,
+                    "timestamp": event.timestamp,
+                    "metric": metric,
+                    "score": z_score,
+                    "explanation": (
+                        f"Anomaly detected for {asset_id}/{metric}: "
+                        f"Value {event.value} is {z_score:.2f} {describe} of {center:.2f}."
+                    ),
+                    "details": details,
+                }
             )
 
+        if anomalies:
+            # Already-recorded events are skipped, but they were still detected
+            persisted = crud.bulk_create_anomaly_records(db, anomalies)
+            # One summary line per task; per-event detail is logged at DEBUG
+            logger.info(
+                "[anomaly] asset=%s metric=%s detected=%d persisted=%d top=%s",
+                asset_id,
+                metric,
+                len(anomalies),
+                persisted,
+                np.round(np.sort(z_scores)[::-1][:5], 2).tolist(),
+            )
+            return f"Detected {len(anomalies)} anomalies for {asset_id}/{metric}."
+
         return f"No anomalies detected for {asset_id}/{metric}."
 
     finally:
-        db.close()
+        WorkerSession.remove()
+
+
+def _precheck_window(
+    db: Session, asset_id: str, metric: str, window_start: datetime, window_end: datetime
+) -> Optional[str]:
+    """
+    Rules out sparse and flat windows from three aggregates before any rows
+    are transferred. Returns the task result to short-circuit with, or None.
+    """
+    count, min_value, max_value = crud.get_window_summary(
+        db, asset_id, metric, window_start, window_end
+    )
+    if count < 10:  # Need a minimum number of data points
+        return f"Not enough data points for {asset_id}/{metric} in the last window."
+    if min_value == max_value:
+        return f"Standard deviation is zero for {asset_id}/{metric}."
+    return None
+
+
+def _values(rows) -> np.ndarray:
+    """
+    Helper to pull the value column out of telemetry rows. Values are stored
+    as REAL, so they are scored in float32 as well.
+    """
+    return np.fromiter((row.value for row in rows), dtype=np.float32, count=len(rows))
+
+
+def _batch_stats(values: np.ndarray) -> tuple:
+    """Helper returning (count, mean, sum of squared deviations) for a batch."""
+    if len(values) == 0:
+        return (0, 0.0, 0.0)
+    mean = float(values.mean())
+    deviations = values - mean
+    # A dot product sums the squares without materializing a squared array
+    return (len(values), mean, float(deviations @ deviations))
+
+
+def _merge_stats(a: tuple, b: tuple) -> tuple:
+    """Combines two (count, mean, M2) summaries (Chan et al. / Welford)."""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    if n_b == 0:
+        return a
+    if n_a == 0:
+        return b
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    return (n, mean_a + delta * n_b / n, m2_a + m2_b + delta**2 * n_a * n_b / n)
+
+
+def _remove_stats(total: tuple, part: tuple) -> Optional[tuple]:
+    """
+    Inverse of _merge_stats: removes a batch's summary from a total. Returns
+    None if the batch can't have been part of the total (more rows than the
+    total holds, or a negative M2 beyond rounding error).
+    """
+    n_t, mean_t, m2_t = total
+    n_p, mean_p, m2_p = part
+    if n_p == 0:
+        return total
+    n = n_t - n_p
+    if n < 0:
+        return None
+    if n == 0:
+        return (0, 0.0, 0.0)
+    mean = (n_t * mean_t - n_p * mean_p) / n
+    delta = mean_p - mean
+    m2 = m2_t - m2_p - delta**2 * n * n_p / n_t
+    # Values are float32, so allow a little relative rounding error
+    if m2 < -1e-6 * max(m2_t, 1.0):
+        return None
+    return (n, mean, max(m2, 0.0))
+
+
+def _median_mad(values: np.ndarray) -> tuple:
+    """Helper returning the median and the median absolute deviation."""
+    median = float(np.median(values))
+    deviations = np.abs(values - median)
+    return median, float(np.median(deviations))
+
+
+def _flag_outliers(
+    values: np.ndarray, mean: float, std_dev: float, threshold: float
+) -> tuple:
+    """
+    Scores values against the window statistics. Returns the indices of the
+    values whose absolute z-score exceeds threshold, and those z-scores.
+    """
+    # |x - mean| / std > threshold  <=>  |x - mean| > threshold * std, so the
+    # scan compares in data units and only the flagged values are divided.
+    deviations = np.abs(values - mean)
+    flagged = np.flatnonzero(deviations > threshold * std_dev)
+    return flagged, deviations[flagged] / std_dev
+
+
+def _stats_key(asset_id: str, metric: str, bucket: int) -> str:
+    return f"zstats:{asset_id}:{metric}:{bucket}"
+
+
+def _load_window_stats(asset_id: str, metric: str, bucket: int) -> Optional[dict]:
+    """
+    Returns the statistics stored by the previous run (or an earlier run in
+    this bucket), or None if a full recompute is due. Redis errors fall back
+    to a full recompute.
+    """
+    max_age = config.ANOMALY_WINDOW_SIZE_SECONDS // config.ANOMALY_SCHEDULE_INTERVAL_SECONDS
+    try:
+        for key in (_stats_key(asset_id, metric, bucket), _stats_key(asset_id, metric, bucket - 1)):
+            cached = redis_client.hgetall(key)
+            if cached:
+                # Rebuild from scratch once per window to shed drift and any
+                # rows that arrived behind the high-water mark.
+                return cached if int(cached["age"]) < max_age else None
+    except redis.RedisError:
+        pass
+    return None
+
+
+def _store_window_stats(
+    asset_id: str,
+    metric: str,
+    bucket: int,
+    stats: tuple,
+    window_start: datetime,
+    last_ts: datetime,
+    age: int,
+) -> None:
+    """Saves a window's statistics for the next run, expiring after two intervals."""
+    n, mean, m2 = stats
+    key = _stats_key(asset_id, metric, bucket)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hset(
+            key,
+            mapping={
+                "n": n,
+                "mean": repr(mean),
+                "m2": repr(m2),
+                "start": window_start.isoformat(),
+                "last_ts": last_ts.isoformat(),
+                "age": age,
+            },
+        )
+        pipe.expire(key, 2 * config.ANOMALY_SCHEDULE_INTERVAL_SECONDS)
+        pipe.execute()
+    except redis.RedisError:
+        pass
 
 
 @celery_app.task(name="app.worker.run_anomaly_detection")
@@ -91,13 +379,31 @@ def run_anomaly_detection():
     """
     Periodic task to run anomaly detection for all assets and metrics.
     """
-    db: Session = SessionLocal()
+    db: Session = WorkerSession()
     try:
-        asset_metrics = crud.get_unique_assets_and_metrics(db)
-        for item in asset_metrics:
-            detect_anomalies.delay(item["asset_id"], item["metric"])
+        # Pairs with no events in the detection window have nothing to score
+        since = datetime.now(timezone.utc) - timedelta(
+            seconds=config.ANOMALY_WINDOW_SIZE_SECONDS
+        )
+        asset_metrics = crud.get_unique_assets_and_metrics(db, since=since)
+        # Skip pairs whose ingest counters show too few events to score.
+        # Pairs without counters, or every pair if Redis is unavailable, are
+        # scheduled anyway; _precheck_window still skips sparse windows.
+        counts = recent_event_counts(asset_metrics, since, datetime.now(timezone.utc))
+        if counts is not None:
+            asset_metrics = [
+                item
+                for item, count in zip(asset_metrics, counts)
+                if count is None or count >= 10
+            ]
+        # Publish every detection task in one batch rather than one
+        # broker round-trip per pair
+        group(
+            detect_anomalies.s(item["asset_id"], item["metric"])
+            for item in asset_metrics
+        ).apply_async()
         return (
             f"Scheduled anomaly detection for {len(asset_metrics)} asset-metric pairs."
         )
     finally:
-        db.close()
+        WorkerSession.remove()
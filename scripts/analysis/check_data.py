@@ -7,12 +7,10 @@ Usage:
 """
 
 import sys
-import os
+from pathlib import Path
 
 # Add project root to path
-sys.path.insert(
-    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../", "../"))
-)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 from app.db import SessionLocal
 from app import models
@@ -41,33 +39,60 @@ metrics_to_check = [
 print(f"\nData in last 10 minutes (detection window):")
 print("-" * 60)
 
-for metric in metrics_to_check:
-    events = (
-        db.query(models.TelemetryEvent)
-        .filter(
-            models.TelemetryEvent.metric == metric,
-            models.TelemetryEvent.timestamp >= start,
-            models.TelemetryEvent.timestamp <= end,
-        )
-        .all()
+# One query for all metrics, then group in a single pass: a contiguous value
+# array plus a small-int metric id per row (structure of arrays).
+rows = (
+    db.query(models.TelemetryEvent.metric, models.TelemetryEvent.value)
+    .filter(
+        models.TelemetryEvent.metric.in_(metrics_to_check),
+        models.TelemetryEvent.timestamp >= start,
+        models.TelemetryEvent.timestamp <= end,
     )
+    .all()
+)
 
-    if events:
-        values = [e.value for e in events]
-        mean = np.mean(values)
-        std = np.std(values)
+metric_ids = {metric: i for i, metric in enumerate(metrics_to_check)}
+ids = np.fromiter(
+    (metric_ids[metric] for metric, _ in rows), dtype=np.int16, count=len(rows)
+)
+vals = np.fromiter((value for _, value in rows), dtype=np.float64, count=len(rows))
+
+n_metrics = len(metrics_to_check)
+counts = np.bincount(ids, minlength=n_metrics)
+sums = np.bincount(ids, weights=vals, minlength=n_metrics)
+
+# Sort by metric id so each metric's values are one contiguous slice
+order = np.argsort(ids, kind="stable")
+vals = vals[order]
+starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+mins = np.full(n_metrics, np.nan)
+maxs = np.full(n_metrics, np.nan)
+present = counts > 0
+if present.any():
+    mins[present] = np.minimum.reduceat(vals, starts[present])
+    maxs[present] = np.maximum.reduceat(vals, starts[present])
+
+for metric_id, metric in enumerate(metrics_to_check):
+    count = counts[metric_id]
+    if count:
+        values = vals[starts[metric_id] : starts[metric_id] + count]
+        mean = sums[metric_id] / count
+        # Reuse the mean from the grouped sums and the deviations for the z-scores
+        deviations = values - mean
+        std = np.sqrt(deviations @ deviations / count)
 
         print(f"\n{metric}:")
-        print(f"  Count: {len(values)}")
-        print(f"  Range: {min(values):.2f} to {max(values):.2f}")
+        print(f"  Count: {count}")
+        print(f"  Range: {mins[metric_id]:.2f} to {maxs[metric_id]:.2f}")
         print(f"  Mean: {mean:.2f}, Std Dev: {std:.2f}")
 
         # Check for potential anomalies (Z-score > 2.0)
         if std > 0:
-            z_scores = [(v - mean) / std for v in values]
-            anomalous = [i for i, z in enumerate(z_scores) if abs(z) > 2.0]
-            if anomalous:
-                print(f"  ⚠️  {len(anomalous)} values with Z-score > 2.0:")
+            z_scores = deviations / std
+            anomalous = np.flatnonzero(np.abs(z_scores) > 2.0)
+            if anomalous.size:
+                print(f"  ⚠️  {anomalous.size} values with Z-score > 2.0:")
                 for idx in anomalous[:5]:  # Show first 5
                     print(
                         f"     Value: {values[idx]:.2f}, Z-score: {z_scores[idx]:.2f}"
@@ -7,12 +7,10 @@ Usage:
 """
 
 import sys
-import os
+from pathlib import Path
 
 # Add project root to path
-sys.path.insert(
-    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../", "../"))
-)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 from app.db import SessionLocal
 from app import models
@@ -36,6 +34,8 @@ exact_duplicates = (
         models.TelemetryEvent.timestamp,
         models.TelemetryEvent.value,
         func.count(models.TelemetryEvent.id).label("count"),
+        # Total number of duplicate sets, computed before the LIMIT applies
+        func.count().over().label("total_sets"),
     )
     .group_by(
         models.TelemetryEvent.asset_id,
@@ -44,12 +44,13 @@ exact_duplicates = (
         models.TelemetryEvent.value,
     )
     .having(func.count(models.TelemetryEvent.id) > 1)
+    .limit(10)  # Show first 10
     .all()
 )
 
 if exact_duplicates:
-    print(f"Found {len(exact_duplicates)} sets of exact duplicates:")
-    for dup in exact_duplicates[:10]:  # Show first 10
+    print(f"Found {exact_duplicates[0].total_sets} sets of exact duplicates:")
+    for dup in exact_duplicates:
         print(f"\n  Asset: {dup.asset_id}")
         print(f"  Metric: {dup.metric}")
         print(f"  Timestamp: {dup.timestamp}")
@@ -69,6 +70,7 @@ timestamp_duplicates = (
         models.TelemetryEvent.timestamp,
         func.count(models.TelemetryEvent.id).label("count"),
         func.array_agg(models.TelemetryEvent.value).label("values"),
+        func.count().over().label("total_sets"),
     )
     .group_by(
         models.TelemetryEvent.asset_id,
@@ -76,12 +78,13 @@ timestamp_duplicates = (
         models.TelemetryEvent.timestamp,
     )
     .having(func.count(models.TelemetryEvent.id) > 1)
+    .limit(10)  # Show first 10
     .all()
 )
 
 if timestamp_duplicates:
-    print(f"Found {len(timestamp_duplicates)} timestamp collisions:")
-    for dup in timestamp_duplicates[:10]:  # Show first 10
+    print(f"Found {timestamp_duplicates[0].total_sets} timestamp collisions:")
+    for dup in timestamp_duplicates:
         values_unique = set(dup.values) if dup.values else set()
         print(f"\n  Asset: {dup.asset_id}")
         print(f"  Metric: {dup.metric}")
@@ -109,6 +112,7 @@ recent_duplicates = (
         models.TelemetryEvent.timestamp,
         models.TelemetryEvent.value,
         func.count(models.TelemetryEvent.id).label("count"),
+        func.count().over().label("total_sets"),
     )
     .filter(
         models.TelemetryEvent.timestamp >= start,
@@ -121,18 +125,20 @@ recent_duplicates = (
         models.TelemetryEvent.value,
     )
     .having(func.count(models.TelemetryEvent.id) > 1)
-    .all()
+    .yield_per(1000)  # Stream rows instead of loading them all
 )
 
-if recent_duplicates:
-    print(f"Found {len(recent_duplicates)} duplicates in last 10 minutes:")
-    for dup in recent_duplicates:
-        print(f"\n  Asset: {dup.asset_id}")
-        print(f"  Metric: {dup.metric}")
-        print(f"  Timestamp: {dup.timestamp}")
-        print(f"  Value: {dup.value}")
-        print(f"  Count: {dup.count} duplicates")
-else:
+found = 0
+for dup in recent_duplicates:
+    if not found:
+        print(f"Found {dup.total_sets} duplicates in last 10 minutes:")
+    found += 1
+    print(f"\n  Asset: {dup.asset_id}")
+    print(f"  Metric: {dup.metric}")
+    print(f"  Timestamp: {dup.timestamp}")
+    print(f"  Value: {dup.value}")
+    print(f"  Count: {dup.count} duplicates")
+if not found:
     print("✅ No duplicates in last 10 minutes")
 
 # Check 4: Anomaly record duplicates
@@ -145,6 +151,7 @@ anomaly_duplicates = (
         models.AnomalyRecord.metric,
         models.AnomalyRecord.timestamp,
         func.count(models.AnomalyRecord.id).label("count"),
+        func.count().over().label("total_sets"),
     )
     .group_by(
         models.AnomalyRecord.asset_id,
@@ -152,17 +159,19 @@ anomaly_duplicates = (
         models.AnomalyRecord.timestamp,
     )
     .having(func.count(models.AnomalyRecord.id) > 1)
-    .all()
+    .yield_per(1000)
 )
 
-if anomaly_duplicates:
-    print(f"Found {len(anomaly_duplicates)} duplicate anomaly records:")
-    for dup in anomaly_duplicates:
-        print(f"\n  Asset: {dup.asset_id}")
-        print(f"  Metric: {dup.metric}")
-        print(f"  Timestamp: {dup.timestamp}")
-        print(f"  Count: {dup.count} duplicates")
-else:
+found = 0
+for dup in anomaly_duplicates:
+    if not found:
+        print(f"Found {dup.total_sets} duplicate anomaly records:")
+    found += 1
+    print(f"\n  Asset: {dup.asset_id}")
+    print(f"  Metric: {dup.metric}")
+    print(f"  Timestamp: {dup.timestamp}")
+    print(f"  Count: {dup.count} duplicates")
+if not found:
     print("✅ No duplicate anomaly records")
 
 # Summary statistics
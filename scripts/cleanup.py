@@ -7,9 +7,37 @@ Usage:
 """
 
 import os
-import glob
+import re
 import shutil
 
+# Never descend into these directories
+SKIP_DIRS = {".git", ".venv", "venv", "node_modules"}
+
+
+def _glob_to_regex(pattern):
+    """
+    Translate a glob pattern (with ** for any depth) into a regex over relative
+    paths. Like glob, wildcards at the start of a name don't match dotfiles.
+    """
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        # A wildcard opening a path component must not match a leading "."
+        no_dot = "(?!\\.)" if i == 0 or pattern[i - 1] == "/" else ""
+        if pattern.startswith("**/", i):
+            regex += "(?:(?!\\.)[^/]*/)*"
+            i += 3
+        elif pattern[i] == "*":
+            regex += no_dot + "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += no_dot + "[^/]"
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
 
 def cleanup():
     """Remove temporary and generated files from the project."""
@@ -44,33 +72,46 @@ def cleanup():
         "image.png",  # Specific unwanted image
     ]
 
+    # One walk over the tree, testing every path against all patterns at once.
+    # Only the cache-directory patterns may delete whole directories.
+    matcher = re.compile("|".join(f"(?:{_glob_to_regex(p)})" for p in patterns))
+    dir_matcher = re.compile(
+        "|".join(
+            f"(?:{_glob_to_regex(p)})"
+            for p in patterns
+            if p.endswith(("__pycache__", ".pytest_cache"))
+        )
+    )
     removed_count = 0
 
-    for pattern in patterns:
-        if "**" in pattern:
-            # Recursive pattern
-            for item in glob.glob(pattern, recursive=True):
-                try:
-                    if os.path.isfile(item):
-                        os.remove(item)
-                        print(f"✅ Removed file: {item}")
-                        removed_count += 1
-                    elif os.path.isdir(item):
-                        shutil.rmtree(item)
-                        print(f"✅ Removed directory: {item}")
-                        removed_count += 1
-                except Exception as e:
-                    print(f"⚠️  Could not remove {item}: {e}")
-        else:
-            # Simple pattern
-            for item in glob.glob(pattern):
-                try:
-                    if os.path.isfile(item):
-                        os.remove(item)
-                        print(f"✅ Removed: {item}")
-                        removed_count += 1
-                except Exception as e:
-                    print(f"⚠️  Could not remove {item}: {e}")
+    for root, dirs, files in os.walk(".", topdown=True):
+        kept_dirs = []
+        for name in dirs:
+            if name in SKIP_DIRS:
+                continue
+            item = os.path.relpath(os.path.join(root, name)).replace(os.sep, "/")
+            if not dir_matcher.fullmatch(item):
+                kept_dirs.append(name)
+                continue
+            try:
+                shutil.rmtree(item)
+                print(f"✅ Removed directory: {item}")
+                removed_count += 1
+            except Exception as e:
+                print(f"⚠️  Could not remove {item}: {e}")
+        # Don't descend into skipped or removed directories
+        dirs[:] = kept_dirs
+
+        for name in files:
+            item = os.path.relpath(os.path.join(root, name)).replace(os.sep, "/")
+            if not matcher.fullmatch(item):
+                continue
+            try:
+                os.remove(item)
+                print(f"✅ Removed file: {item}")
+                removed_count += 1
+            except Exception as e:
+                print(f"⚠️  Could not remove {item}: {e}")
 
     print("=" * 60)
     print(f"🎉 Cleanup complete! Removed {removed_count} items.")
@@ -6,122 +6,52 @@ Usage:
     python scripts/data_generation/generate_current_test_data.py
 """
 
-import json
 from datetime import datetime, timedelta, timezone
 
-now = datetime.now(timezone.utc)
-
-events = []
-
-# Generate data for rocket-1 with multiple anomalies
-for i in range(15):
-    timestamp = (now - timedelta(minutes=14 - i)).isoformat()
-
-    # Normal engine_temp data
-    engine_temp = 500.0 + i * 5
-    # Add extreme anomaly at minute 8
-    if i == 8:
-        engine_temp = 2000.0  # Extreme spike
-
-    # Normal fuel_pressure
-    fuel_pressure = 2500.0 + i * 10
-    # Add anomaly at minute 10
-    if i == 10:
-        fuel_pressure = 5000.0  # Extreme spike
+import numpy as np
+import orjson
 
-    # Normal fuel_level (should decrease)
-    fuel_level = 100.0 - i * 2
-    # Add anomaly at minute 12 (sudden drop)
-    if i == 12:
-        fuel_level = 10.0  # Critical low
-
-    # Normal altitude
-    altitude = i * 50.0
-    # Add anomaly at minute 7
-    if i == 7:
-        altitude = 5000.0  # Sudden jump
-
-    # Normal velocity
-    velocity = i * 10.0
-    # Add anomaly at minute 9
-    if i == 9:
-        velocity = 500.0  # Too fast
-
-    # Normal acceleration
-    accel_x = 0.1 * i
-    accel_y = 0.1 * i
-    accel_z = 9.81 + 0.5 * i
-
-    # Add acceleration anomaly at minute 11
-    if i == 11:
-        accel_x = 100.0  # Extreme acceleration
-        accel_z = 50.0
+now = datetime.now(timezone.utc)
 
-    events.extend(
-        [
-            {
-                "asset_id": "rocket-1",
-                "timestamp": timestamp,
-                "metric": "engine_temp",
-                "value": engine_temp,
-                "unit": "C",
-            },
-            {
-                "asset_id": "rocket-1",
-                "timestamp": timestamp,
-                "metric": "fuel_pressure",
-                "value": fuel_pressure,
-                "unit": "psi",
-            },
-            {
-                "asset_id": "rocket-1",
-                "timestamp": timestamp,
-                "metric": "fuel_level",
-                "value": fuel_level,
-                "unit": "%",
-            },
-            {
-                "asset_id": "rocket-1",
-                "timestamp": timestamp,
-                "metric": "altitude",
-                "value": altitude,
-                "unit": "m",
-            },
-            {
-                "asset_id": "rocket-1",
-                "timestamp": timestamp,
-                "metric": "velocity",
-                "value": velocity,
-                "unit": "m/s",
-            },
-            {
-                "asset_id": "rocket-1",
-                "timestamp": timestamp,
-                "metric": "acceleration_x",
-                "value": accel_x,
-                "unit": "m/s²",
-            },
-            {
-                "asset_id": "rocket-1",
-                "timestamp": timestamp,
-                "metric": "acceleration_y",
-                "value": accel_y,
-                "unit": "m/s²",
-            },
-            {
-                "asset_id": "rocket-1",
-                "timestamp": timestamp,
-                "metric": "acceleration_z",
-                "value": accel_z,
-                "unit": "m/s²",
-            },
-        ]
-    )
+# Generate data for rocket-1 with multiple anomalies, one point per minute
+i = np.arange(15)
+timestamps = [(now - timedelta(minutes=14 - int(k))).isoformat() for k in i]
+
+# (metric, unit, values): a normal trend per metric with anomalies injected by minute
+series = [
+    # Extreme spike at minute 8
+    ("engine_temp", "C", np.where(i == 8, 2000.0, 500.0 + i * 5)),
+    # Extreme spike at minute 10
+    ("fuel_pressure", "psi", np.where(i == 10, 5000.0, 2500.0 + i * 10)),
+    # Should decrease; critical low at minute 12
+    ("fuel_level", "%", np.where(i == 12, 10.0, 100.0 - i * 2)),
+    # Sudden jump at minute 7
+    ("altitude", "m", np.where(i == 7, 5000.0, i * 50.0)),
+    # Too fast at minute 9
+    ("velocity", "m/s", np.where(i == 9, 500.0, i * 10.0)),
+    # Extreme acceleration at minute 11
+    ("acceleration_x", "m/s²", np.where(i == 11, 100.0, 0.1 * i)),
+    ("acceleration_y", "m/s²", 0.1 * i),
+    ("acceleration_z", "m/s²", np.where(i == 11, 50.0, 9.81 + 0.5 * i)),
+]
+series = [(metric, unit, values.tolist()) for metric, unit, values in series]
+
+events = [
+    {
+        "asset_id": "rocket-1",
+        "timestamp": timestamp,
+        "metric": metric,
+        "value": values[k],
+        "unit": unit,
+    }
+    for k, timestamp in enumerate(timestamps)
+    for metric, unit, values in series
+]
 
 output = {"events": events}
 
-with open("tests/data/current_test_with_anomalies.json", "w") as f:
-    json.dump(output, f, indent=2)
+with open("tests/data/current_test_with_anomalies.json", "wb") as f:
+    f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
 
 print(f"✅ Generated {len(events)} events with multiple anomalies")
 print(f"   Expected anomalies in:")
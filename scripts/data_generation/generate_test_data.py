@@ -7,208 +7,201 @@ Usage:
     python scripts/data_generation/generate_test_data.py
 """
 
-import json
-import random
 from datetime import datetime, timedelta
+from itertools import chain
+from typing import Iterable, Iterator
 import numpy as np
+import orjson
+
+
+METRIC_UNITS = {
+    "engine_temp": "C",
+    "fuel_pressure": "psi",
+    "acceleration_x": "m/s²",
+    "acceleration_y": "m/s²",
+    "acceleration_z": "m/s²",
+    "velocity": "m/s",
+    "altitude": "m",
+    "fuel_level": "%",
+    "battery_voltage": "V",
+    "gyroscope_x": "deg/s",
+    "gyroscope_y": "deg/s",
+    "gyroscope_z": "deg/s",
+}
 
 
 def generate_normal_telemetry(
     asset_id: str, base_time: datetime, duration_minutes: int = 60
-) -> list:
-    """Generate normal rocket telemetry data."""
-    events = []
-    current_time = base_time
-
-    while current_time < base_time + timedelta(minutes=duration_minutes):
-        # Normal operating ranges
-        telemetry_data = {
-            "engine_temp": random.uniform(600, 750),  # Celsius
-            "fuel_pressure": random.uniform(2400, 2600),  # psi
-            "acceleration_x": random.uniform(-0.5, 0.5),  # m/s²
-            "acceleration_y": random.uniform(-0.5, 0.5),  # m/s²
-            "acceleration_z": random.uniform(9.5, 10.0),  # m/s² (gravity)
-            "velocity": min(current_time.minute * 10, 800),  # m/s (increasing)
-            "altitude": min(current_time.minute * 100, 5000),  # meters
-            "fuel_level": max(100 - current_time.minute * 1.5, 10),  # %
-            "battery_voltage": random.uniform(28.0, 29.0),  # V
-            "gyroscope_x": random.uniform(-2, 2),  # deg/s
-            "gyroscope_y": random.uniform(-2, 2),  # deg/s
-            "gyroscope_z": random.uniform(-2, 2),  # deg/s
-        }
+) -> Iterator[dict]:
+    """Generate normal rocket telemetry data, lazily one event at a time."""
+    rng = np.random.default_rng()
+    num_ticks = duration_minutes * 2  # Data every 30 seconds
+    times = np.datetime64(base_time, "s") + np.timedelta64(30, "s") * np.arange(
+        num_ticks
+    )
+    # Formatted in bulk, once per tick, and shared by all of its metrics
+    timestamps = np.char.add(times.astype(str), "Z").tolist()
+    # Minute of the hour, which drives the slow flight-profile metrics
+    minutes = (times.astype("datetime64[m]") - times.astype("datetime64[h]")).astype(int)
+
+    # Normal operating ranges, one vectorized draw per metric
+    columns = {
+        "engine_temp": rng.uniform(600, 750, num_ticks),  # Celsius
+        "fuel_pressure": rng.uniform(2400, 2600, num_ticks),  # psi
+        "acceleration_x": rng.uniform(-0.5, 0.5, num_ticks),  # m/s²
+        "acceleration_y": rng.uniform(-0.5, 0.5, num_ticks),  # m/s²
+        "acceleration_z": rng.uniform(9.5, 10.0, num_ticks),  # m/s² (gravity)
+        "velocity": np.minimum(minutes * 10, 800),  # m/s (increasing)
+        "altitude": np.minimum(minutes * 100, 5000),  # meters
+        "fuel_level": np.maximum(100 - minutes * 1.5, 10),  # %
+        "battery_voltage": rng.uniform(28.0, 29.0, num_ticks),  # V
+        "gyroscope_x": rng.uniform(-2, 2, num_ticks),  # deg/s
+        "gyroscope_y": rng.uniform(-2, 2, num_ticks),  # deg/s
+        "gyroscope_z": rng.uniform(-2, 2, num_ticks),  # deg/s
+    }
+    # Round each column once and convert to Python numbers in bulk
+    columns = {metric: np.round(v, 2).tolist() for metric, v in columns.items()}
 
-        for metric, value in telemetry_data.items():
-            unit = {
-                "engine_temp": "C",
-                "fuel_pressure": "psi",
-                "acceleration_x": "m/s²",
-                "acceleration_y": "m/s²",
-                "acceleration_z": "m/s²",
-                "velocity": "m/s",
-                "altitude": "m",
-                "fuel_level": "%",
-                "battery_voltage": "V",
-                "gyroscope_x": "deg/s",
-                "gyroscope_y": "deg/s",
-                "gyroscope_z": "deg/s",
-            }[metric]
-
-            events.append(
-                {
-                    "asset_id": asset_id,
-                    "timestamp": current_time.isoformat() + "Z",
-                    "metric": metric,
-                    "value": round(value, 2),
-                    "unit": unit,
-                }
-            )
-
-        current_time += timedelta(seconds=30)  # Data every 30 seconds
-
-    return events
-
-
-def generate_anomalous_telemetry(asset_id: str, base_time: datetime) -> list:
-    """Generate telemetry data with anomalies."""
-    events = []
+    for i, timestamp in enumerate(timestamps):
+        for metric, values in columns.items():
+            yield {
+                "asset_id": asset_id,
+                "timestamp": timestamp,
+                "metric": metric,
+                "value": values[i],
+                "unit": METRIC_UNITS[metric],
+            }
 
-    # Normal data first
-    normal_time = base_time
-    for i in range(10):
-        events.extend(generate_normal_telemetry(asset_id, normal_time, 1))
-        normal_time += timedelta(minutes=1)
+
+def generate_anomalous_telemetry(
+    asset_id: str, base_time: datetime
+) -> Iterator[dict]:
+    """Generate telemetry data with anomalies."""
+    # Normal data first: ten minutes, generated (and timestamped) in one pass
+    yield from generate_normal_telemetry(asset_id, base_time, 10)
 
     # Add anomalies
-    anomaly_time = normal_time
+    anomaly_time = base_time + timedelta(minutes=10)
+    # The anomaly series share their 30-second ticks, so format them once
+    anomaly_stamps = [
+        (anomaly_time + timedelta(seconds=i * 30)).isoformat() + "Z" for i in range(5)
+    ]
 
     # Engine overheating anomaly
     for i in range(5):
-        events.append(
-            {
-                "asset_id": asset_id,
-                "timestamp": (anomaly_time + timedelta(seconds=i * 30)).isoformat()
-                + "Z",
-                "metric": "engine_temp",
-                "value": 950 + i * 20,  # Critical overheating
-                "unit": "C",
-            }
-        )
+        yield {
+            "asset_id": asset_id,
+            "timestamp": anomaly_stamps[i],
+            "metric": "engine_temp",
+            "value": 950 + i * 20,  # Critical overheating
+            "unit": METRIC_UNITS["engine_temp"],
+        }
 
     # Fuel pressure drop anomaly
     for i in range(5):
-        events.append(
-            {
-                "asset_id": asset_id,
-                "timestamp": (anomaly_time + timedelta(seconds=i * 30)).isoformat()
-                + "Z",
-                "metric": "fuel_pressure",
-                "value": 1800 - i * 100,  # Pressure dropping dangerously
-                "unit": "psi",
-            }
-        )
+        yield {
+            "asset_id": asset_id,
+            "timestamp": anomaly_stamps[i],
+            "metric": "fuel_pressure",
+            "value": 1800 - i * 100,  # Pressure dropping dangerously
+            "unit": METRIC_UNITS["fuel_pressure"],
+        }
 
     # Gyroscope spike (stability issue)
     for i in range(3):
-        events.append(
-            {
-                "asset_id": asset_id,
-                "timestamp": (anomaly_time + timedelta(seconds=i * 30)).isoformat()
-                + "Z",
-                "metric": "gyroscope_z",
-                "value": 45 + i * 15,  # Excessive rotation
-                "unit": "deg/s",
-            }
-        )
-
-    return events
+        yield {
+            "asset_id": asset_id,
+            "timestamp": anomaly_stamps[i],
+            "metric": "gyroscope_z",
+            "value": 45 + i * 15,  # Excessive rotation
+            "unit": METRIC_UNITS["gyroscope_z"],
+        }
 
 
-def generate_launch_sequence(asset_id: str, launch_time: datetime) -> list:
+def generate_launch_sequence(asset_id: str, launch_time: datetime) -> Iterator[dict]:
     """Generate complete launch sequence telemetry."""
-    events = []
-
-    # Pre-launch (T-10 minutes to T-0)
-    pre_launch_time = launch_time - timedelta(minutes=10)
-    while pre_launch_time < launch_time:
-        events.extend(generate_normal_telemetry(asset_id, pre_launch_time, 1))
-        pre_launch_time += timedelta(minutes=1)
-
-    # Launch phase (T+0 to T+5 minutes)
-    launch_phase_time = launch_time
-    for minute in range(6):
-        current_time = launch_phase_time + timedelta(minutes=minute)
-
-        # Increasing acceleration during launch
-        accel_z = 9.81 + minute * 20  # Building thrust
-
-        telemetry_data = {
-            "engine_temp": 650 + minute * 50,
-            "fuel_pressure": 2500 + minute * 100,
-            "acceleration_x": random.uniform(-1, 1),
-            "acceleration_y": random.uniform(-1, 1),
-            "acceleration_z": accel_z,
-            "velocity": minute * 200,  # Rapid acceleration
-            "altitude": minute * 1200,  # Climbing fast
-            "fuel_level": max(100 - minute * 15, 0),
-            "battery_voltage": 28.5,
-            "gyroscope_x": random.uniform(-5, 5),
-            "gyroscope_y": random.uniform(-5, 5),
-            "gyroscope_z": random.uniform(-5, 5),
-        }
+    # Pre-launch (T-10 minutes to T-0), generated (and timestamped) in one pass
+    yield from generate_normal_telemetry(
+        asset_id, launch_time - timedelta(minutes=10), 10
+    )
+
+    # Launch phase (T+0 to T+5 minutes), one sample per minute
+    rng = np.random.default_rng()
+    minute = np.arange(6)
+    timestamps = [
+        (launch_time + timedelta(minutes=int(m))).isoformat() + "Z" for m in minute
+    ]
+
+    columns = {
+        "engine_temp": 650 + minute * 50,
+        "fuel_pressure": 2500 + minute * 100,
+        "acceleration_x": rng.uniform(-1, 1, minute.size),
+        "acceleration_y": rng.uniform(-1, 1, minute.size),
+        "acceleration_z": 9.81 + minute * 20,  # Building thrust
+        "velocity": minute * 200,  # Rapid acceleration
+        "altitude": minute * 1200,  # Climbing fast
+        "fuel_level": np.maximum(100 - minute * 15, 0),
+        "battery_voltage": np.full(minute.size, 28.5),
+        "gyroscope_x": rng.uniform(-5, 5, minute.size),
+        "gyroscope_y": rng.uniform(-5, 5, minute.size),
+        "gyroscope_z": rng.uniform(-5, 5, minute.size),
+    }
+    columns = {metric: np.round(v, 2).tolist() for metric, v in columns.items()}
 
-        for metric, value in telemetry_data.items():
-            unit = {
-                "engine_temp": "C",
-                "fuel_pressure": "psi",
-                "acceleration_x": "m/s²",
-                "acceleration_y": "m/s²",
-                "acceleration_z": "m/s²",
-                "velocity": "m/s",
-                "altitude": "m",
-                "fuel_level": "%",
-                "battery_voltage": "V",
-                "gyroscope_x": "deg/s",
-                "gyroscope_y": "deg/s",
-                "gyroscope_z": "deg/s",
-            }[metric]
-
-            events.append(
-                {
-                    "asset_id": asset_id,
-                    "timestamp": current_time.isoformat() + "Z",
-                    "metric": metric,
-                    "value": round(value, 2),
-                    "unit": unit,
-                }
-            )
-
-    return events
+    for i, timestamp in enumerate(timestamps):
+        for metric, values in columns.items():
+            yield {
+                "asset_id": asset_id,
+                "timestamp": timestamp,
+                "metric": metric,
+                "value": values[i],
+                "unit": METRIC_UNITS[metric],
+            }
+
+
+def write_events(path: str, events: Iterable[dict]) -> int:
+    """
+    Streams events to path as a {"events": [...]} document, one event per
+    line, without serializing the whole dataset at once. Returns the count.
+    """
+    count = 0
+    with open(path, "wb") as f:
+        f.write(b'{"events": [\n')
+        for event in events:
+            if count:
+                f.write(b",\n")
+            f.write(orjson.dumps(event))
+            count += 1
+        f.write(b"\n]}\n")
+    return count
 
 
 def main():
     """Generate comprehensive test datasets."""
     base_time = datetime(2025, 11, 20, 8, 0, 0)
 
-    # Generate different test scenarios
+    # Different test scenarios; each is a generator consumed while it is
+    # written, so no dataset is ever held in memory as a whole
     datasets = {
-        "normal_operation.json": generate_normal_telemetry("rocket-1", base_time, 30),
-        "anomalous_data.json": generate_anomalous_telemetry("rocket-1", base_time),
-        "launch_sequence.json": generate_launch_sequence("rocket-1", base_time),
-        "multi_asset_normal.json": (
-            generate_normal_telemetry("rocket-1", base_time, 15)
-            + generate_normal_telemetry("rocket-2", base_time, 15)
+        "normal_operation.json": lambda: generate_normal_telemetry(
+            "rocket-1", base_time, 30
         ),
-        "stress_test_large.json": generate_normal_telemetry(
+        "anomalous_data.json": lambda: generate_anomalous_telemetry(
+            "rocket-1", base_time
+        ),
+        "launch_sequence.json": lambda: generate_launch_sequence("rocket-1", base_time),
+        "multi_asset_normal.json": lambda: chain(
+            generate_normal_telemetry("rocket-1", base_time, 15),
+            generate_normal_telemetry("rocket-2", base_time, 15),
+        ),
+        "stress_test_large.json": lambda: generate_normal_telemetry(
             "rocket-1", base_time, 120
         ),  # 2 hours of data
     }
 
-    for filename, events in datasets.items():
-        data = {"events": events}
-        with open(f"../data/test_data_{filename}", "w") as f:
-            json.dump(data, f, indent=2)
-
-        print(f"Generated {filename}: {len(events)} telemetry events")
+    for filename, generate in datasets.items():
+        count = write_events(f"../data/test_data_{filename}", generate())
+        print(f"Generated {filename}: {count} telemetry events")
 
     print("\nTest data generation complete!")
     print("Files created:")
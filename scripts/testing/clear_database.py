@@ -3,13 +3,34 @@ Clear all telemetry and anomaly data from the database.
 """
 
 import sys
-import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../", "../")))
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import DBAPIError
 
 from app.db import SessionLocal
 from app.models import TelemetryEvent, AnomalyRecord
 
+# Both counts in a single round-trip, built from the models so the ORM
+# fallback path (non-Postgres databases) can use it too
+COUNT_STMT = select(
+    select(func.count()).select_from(TelemetryEvent).scalar_subquery(),
+    select(func.count()).select_from(AnomalyRecord).scalar_subquery(),
+)
+
+# Fallback when TRUNCATE isn't permitted: both deletes in one statement (the
+# foreign key is checked at the end of it), returning the deleted counts.
+DELETE_ALL_SQL = text(
+    """
+    WITH a AS (DELETE FROM anomaly_records RETURNING 1),
+         t AS (DELETE FROM telemetry_events RETURNING 1)
+    SELECT (SELECT COUNT(*) FROM t), (SELECT COUNT(*) FROM a)
+    """
+)
+
 def main():
+    """Empties both tables. Returns True on success."""
     print("=" * 80)
     print("CLEARING DATABASE")
     print("=" * 80)
@@ -18,8 +39,7 @@ def main():
     
     try:
         # Count before deletion
-        telemetry_count = db.query(TelemetryEvent).count()
-        anomaly_count = db.query(AnomalyRecord).count()
+        telemetry_count, anomaly_count = db.execute(COUNT_STMT).one()
         
         print(f"\n📊 Current Database State:")
         print(f"   Telemetry Events: {telemetry_count}")
@@ -27,32 +47,42 @@ def main():
         
         if telemetry_count == 0 and anomaly_count == 0:
             print("\n✅ Database is already empty!")
-            return
+            return True
         
         # Delete all records
         print(f"\n🗑️  Deleting all records...")
-        db.query(AnomalyRecord).delete()
-        db.query(TelemetryEvent).delete()
+        if db.bind.dialect.name == "postgresql":
+            try:
+                # TRUNCATE drops the tables' pages instead of deleting row by row
+                db.execute(
+                    text("TRUNCATE TABLE anomaly_records, telemetry_events RESTART IDENTITY CASCADE")
+                )
+                telemetry_deleted, anomaly_deleted = telemetry_count, anomaly_count
+            except DBAPIError as e:
+                print(f"   TRUNCATE failed ({e.orig}), deleting instead...")
+                db.rollback()
+                telemetry_deleted, anomaly_deleted = db.execute(DELETE_ALL_SQL).one()
+        else:
+            anomaly_deleted = db.query(AnomalyRecord).delete()
+            telemetry_deleted = db.query(TelemetryEvent).delete()
         db.commit()
         
-        # Verify deletion
-        telemetry_count_after = db.query(TelemetryEvent).count()
-        anomaly_count_after = db.query(AnomalyRecord).count()
-        
         print(f"\n✅ Database Cleared Successfully!")
-        print(f"   Telemetry Events: {telemetry_count_after}")
-        print(f"   Anomaly Records: {anomaly_count_after}")
+        print(f"   Telemetry Events deleted: {telemetry_deleted}")
+        print(f"   Anomaly Records deleted: {anomaly_deleted}")
         
         print("\n💡 Next Steps:")
         print("   1. Run: python scripts/testing/generate_realtime_data.py")
-        print("   2. Wait 5 minutes for Celery Beat to trigger detection")
+        print("   2. Wait ~30 seconds for Celery Beat to trigger detection")
         print("   3. Run: python scripts/testing/verify_anomalies.py")
+        return True
         
     except Exception as e:
         print(f"\n❌ Error: {e}")
         db.rollback()
+        return False
     finally:
         db.close()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
@@ -3,26 +3,76 @@ Complete end-to-end testing workflow for Celery anomaly detection.
 This script automates: clear DB -> ingest data -> wait for detection -> verify results
 """
 
-import subprocess
+import os
+import re
+import socket
 import sys
 import time
+import redis
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# The workflow steps are the sibling scripts, run in-process
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import clear_database as clear_database_script
+import generate_realtime_data
+import test_all_endpoints
+import verify_anomalies
 
 BASE_URL = "http://localhost:8000"
+RESULT_BACKEND_URL = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+
+# One keep-alive connection pool (with connect retries) for every call in this script
+SESSION = requests.Session()
+SESSION.mount(
+    "http://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        max_retries=Retry(total=3, backoff_factor=0.3),
+    ),
+)
+
+def run_step(func):
+    """Calls a script's main(); exceptions and sys.exit() count as failure"""
+    try:
+        return bool(func())
+    except SystemExit as e:
+        return e.code in (None, 0)
+    except Exception as e:
+        print(f"❌ {type(e).__name__}: {e}")
+        return False
 
 def print_header(text):
     print("\n" + "=" * 80)
     print(f"  {text}")
     print("=" * 80)
 
+def api_port_open(timeout=0.3):
+    """Cheap liveness probe: can we open a TCP connection to the API at all?"""
+    url = urlsplit(BASE_URL)
+    try:
+        socket.create_connection((url.hostname, url.port or 80), timeout=timeout).close()
+        return True
+    except OSError:
+        return False
+
 def check_services():
     """Check if required services are running"""
     print_header("STEP 0: CHECKING SERVICES")
     
-    # Check FastAPI
+    # Check FastAPI: a refused connection fails fast instead of going through
+    # the session's HTTP retries; a GET then confirms it is really the API
+    if not api_port_open():
+        print("❌ FastAPI server is NOT running!")
+        print("   Start it with: uvicorn app.main:app --reload")
+        return False
     try:
-        response = requests.get(f"{BASE_URL}/metrics", timeout=2)
+        response = SESSION.get(f"{BASE_URL}/metrics", timeout=2)
         if response.status_code == 200:
             print("✅ FastAPI server is running")
         else:
@@ -45,111 +95,113 @@ def check_services():
 def clear_database():
     """Clear the database"""
     print_header("STEP 1: CLEARING DATABASE")
-    try:
-        result = subprocess.run(
-            [sys.executable, "scripts/testing/clear_database.py"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        print(result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to clear database: {e}")
-        print(e.output)
+    if not run_step(clear_database_script.main):
+        print("❌ Failed to clear database")
         return False
+    return True
 
 def ingest_test_data():
     """Ingest test data with current timestamps"""
     print_header("STEP 2: INGESTING TEST DATA")
+    if not run_step(generate_realtime_data.main):
+        print("❌ Failed to ingest data")
+        return False
+    return True
+
+# Polling only needs one integer out of /metrics, so skip the full JSON parse
+ANOMALY_COUNT_RE = re.compile(rb'"total_anomaly_records"\s*:\s*(\d+)')
+
+def fetch_anomaly_count():
+    """Current number of anomaly records, or None if /metrics is unavailable"""
+    response = SESSION.get(f"{BASE_URL}/metrics")
+    if response.status_code != 200:
+        return None
+    match = ANOMALY_COUNT_RE.search(response.content)
+    return int(match.group(1)) if match else None
+
+def open_task_result_feed():
+    """Subscribe to Celery's result channels; returns None if Redis is unreachable"""
     try:
-        result = subprocess.run(
-            [sys.executable, "scripts/testing/generate_realtime_data.py"],
-            capture_output=True,
-            text=True,
-            check=True
+        pubsub = redis.Redis.from_url(RESULT_BACKEND_URL).pubsub(
+            ignore_subscribe_messages=True
         )
-        print(result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to ingest data: {e}")
-        return False
+        # The Redis result backend publishes each stored result on its key
+        pubsub.psubscribe("celery-task-meta-*")
+        return pubsub
+    except redis.RedisError:
+        return None
 
 def wait_for_celery_beat():
     """Wait for Celery Beat to trigger detection"""
     print_header("STEP 3: WAITING FOR CELERY BEAT")
     
-    print("\n⏰ Celery Beat runs every 5 minutes")
+    print("\n⏰ Celery Beat runs every 30 seconds (± a few seconds of jitter)")
     print("🔍 Watch your Celery Worker terminal for logs like:")
     print("   [INFO] Task app.worker.run_anomaly_detection received")
     print("   [INFO] Detected X anomalies for rocket-1/metric_name")
     print()
     
     # Check current anomaly count
-    response = requests.get(f"{BASE_URL}/metrics")
-    if response.status_code == 200:
-        initial_anomalies = response.json()['total_anomaly_records']
-        print(f"📊 Current anomalies in DB: {initial_anomalies}")
+    initial_anomalies = fetch_anomaly_count() or 0
+    print(f"📊 Current anomalies in DB: {initial_anomalies}")
     
-    print("\n⏳ Checking for anomalies every 10 seconds...")
+    # Wake as soon as a Celery task finishes; otherwise back off from 2s to 30s
+    feed = open_task_result_feed()
+    if feed is not None:
+        print("\n⏳ Checking for anomalies whenever a Celery task completes...")
+    else:
+        print("\n⏳ Checking for anomalies with backoff (2s up to 30s)...")
     print("   Press Ctrl+C to skip waiting and check now")
     
-    max_wait = 6 * 60  # 6 minutes max
-    elapsed = 0
+    max_wait = 2 * 60  # A few beat cycles, jitter included
+    deadline = time.monotonic() + max_wait
+    delay = 2
     
     try:
-        while elapsed < max_wait:
-            time.sleep(10)
-            elapsed += 10
+        while time.monotonic() < deadline:
+            timeout = min(delay, deadline - time.monotonic())
+            if feed is not None:
+                try:
+                    feed.get_message(timeout=timeout)
+                except redis.RedisError:
+                    feed = None
+                    time.sleep(timeout)
+            else:
+                time.sleep(timeout)
+            delay = min(delay * 2, 30)
             
             # Check if anomalies were detected
-            response = requests.get(f"{BASE_URL}/metrics")
-            if response.status_code == 200:
-                current_anomalies = response.json()['total_anomaly_records']
-                
-                if current_anomalies > initial_anomalies:
-                    print(f"\n✅ Anomalies detected! ({current_anomalies} total)")
-                    return True
+            current_anomalies = fetch_anomaly_count()
+            if current_anomalies is not None and current_anomalies > initial_anomalies:
+                print(f"\n✅ Anomalies detected! ({current_anomalies} total)")
+                return True
             
-            remaining = max_wait - elapsed
-            print(f"   Waiting... ({remaining}s remaining)")
+            remaining = max(deadline - time.monotonic(), 0)
+            print(f"   Waiting... ({remaining:.0f}s remaining)")
     
     except KeyboardInterrupt:
         print("\n⏹️  Skipping wait, checking current state...")
+    finally:
+        if feed is not None:
+            feed.close()
     
     return True
 
 def verify_results():
     """Verify anomaly detection results"""
     print_header("STEP 4: VERIFYING RESULTS")
-    try:
-        result = subprocess.run(
-            [sys.executable, "scripts/testing/verify_anomalies.py"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        print(result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Verification failed: {e}")
+    if not run_step(verify_anomalies.main):
+        print("❌ Verification failed")
         return False
+    return True
 
 def test_endpoints():
     """Test all API endpoints"""
     print_header("STEP 5: TESTING ALL ENDPOINTS")
-    try:
-        result = subprocess.run(
-            [sys.executable, "scripts/testing/test_all_endpoints.py"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        print(result.stdout)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Endpoint tests failed: {e}")
+    if not run_step(test_all_endpoints.main):
+        print("❌ Endpoint tests failed")
         return False
+    return True
 
 def main():
     print("\n" + "🚀" * 40)
@@ -166,6 +218,8 @@ def main():
         ("Clear Database", clear_database),
         ("Ingest Test Data", ingest_test_data),
         ("Wait for Celery Beat", wait_for_celery_beat),
+        # Verification must finish first: the endpoint tests ingest more
+        # rocket-1 data, which would change the counts it reports
         ("Verify Anomalies", verify_results),
         ("Test All Endpoints", test_endpoints),
     ]
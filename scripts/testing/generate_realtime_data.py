@@ -1,21 +1,55 @@
 """
 Generate real-time telemetry data with current timestamps for testing anomaly detection.
 This ensures the data falls within Celery's 10-minute detection window.
+
+Events are always POSTed as {"events": [...]} batches of up to BATCH_SIZE;
+/ingest writes each batch with a single multi-row INSERT.
 """
 
-import json
+import gzip
+import sys
+from itertools import islice
+from dataclasses import dataclass
+import orjson
 import requests
-from datetime import datetime, timedelta
-import random
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timezone
+import numpy as np
 
 BASE_URL = "http://localhost:8000"
+BATCH_SIZE = 500  # Events per /ingest request
+
+# One keep-alive connection pool (with connect retries) for every call in this script
+SESSION = requests.Session()
+SESSION.mount(
+    "http://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        max_retries=Retry(total=3, backoff_factor=0.3),
+    ),
+)
+
+TAGS = {"test": "realtime_anomaly_detection"}
+
+@dataclass
+class Event:
+    """One telemetry reading; orjson serializes slotted dataclasses natively"""
+    # Declared by hand: dataclass(slots=True) needs Python 3.10+
+    __slots__ = ("asset_id", "timestamp", "metric", "value", "unit", "tags")
+    asset_id: str
+    timestamp: str
+    metric: str
+    value: float
+    unit: str
+    tags: dict
 
 def generate_realtime_telemetry_with_anomalies():
     """
     Generate telemetry data with current timestamps, including anomalous values.
     """
-    now = datetime.utcnow()
-    events = []
+    now = datetime.now(timezone.utc).timestamp()
     
     # Define metrics with normal ranges and anomalous values
     metrics_config = {
@@ -33,30 +67,31 @@ def generate_realtime_telemetry_with_anomalies():
         "gyroscope_z": {"normal": (-5, 5), "anomaly": 50, "unit": "deg/s"},
     }
     
+    anomalous_metrics = {"engine_temp", "fuel_pressure", "acceleration_z"}
+    num_points = 30
+    rng = np.random.default_rng()
+    
     # Generate 30 data points over the last 9 minutes (within the 10-minute window)
-    for i in range(30):
-        timestamp = now - timedelta(seconds=540 - (i * 18))  # 18-second intervals
-        
-        for metric_name, config in metrics_config.items():
-            # Most values are normal
-            if i < 25:
-                value = random.uniform(config["normal"][0], config["normal"][1])
-            else:
-                # Last 5 data points include anomalies for some metrics
-                if metric_name in ["engine_temp", "fuel_pressure", "acceleration_z"]:
-                    value = config["anomaly"]
-                else:
-                    value = random.uniform(config["normal"][0], config["normal"][1])
-            
-            event = {
-                "asset_id": "rocket-1",
-                "timestamp": timestamp.isoformat() + "Z",
-                "metric": metric_name,
-                "value": round(value, 2),
-                "unit": config["unit"],
-                "tags": {"test": "realtime_anomaly_detection"}
-            }
-            events.append(event)
+    timestamps = [
+        # 18-second intervals; offsets are plain float seconds from one "now"
+        datetime.fromtimestamp(now - (540 - i * 18), tz=timezone.utc).isoformat()
+        for i in range(num_points)
+    ]
+    
+    # One vectorized draw per metric; most values are normal
+    series = []
+    for metric_name, config in metrics_config.items():
+        values = np.round(rng.uniform(*config["normal"], size=num_points), 2)
+        if metric_name in anomalous_metrics:
+            # Last 5 data points include anomalies for some metrics
+            values[25:] = config["anomaly"]
+        series.append((metric_name, config["unit"], values.tolist()))
+    
+    events = [
+        Event("rocket-1", timestamp, metric_name, values[i], unit, TAGS)
+        for i, timestamp in enumerate(timestamps)
+        for metric_name, unit, values in series
+    ]
     
     return events
 
@@ -66,24 +101,29 @@ def ingest_data(events):
     print(f"⏰ Time range: Last 9 minutes (within 10-minute detection window)")
     print(f"🎯 Anomalies injected in: engine_temp, fuel_pressure, acceleration_z")
     
-    response = requests.post(
-        f"{BASE_URL}/ingest",
-        json={"events": events},
-        headers={"Content-Type": "application/json"}
-    )
+    ingested = 0
+    batches = iter(events)
+    while batch := list(islice(batches, BATCH_SIZE)):
+        # Telemetry JSON is very repetitive, so even the fastest gzip level
+        # shrinks it several times over
+        response = SESSION.post(
+            f"{BASE_URL}/ingest",
+            data=gzip.compress(orjson.dumps({"events": batch}), compresslevel=1),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+        
+        if response.status_code != 200:
+            print(f"❌ Failed to ingest data: {response.status_code}")
+            print(f"   Response: {response.text}")
+            return False
+        ingested += response.json()['ingested']
     
-    if response.status_code == 200:
-        result = response.json()
-        print(f"✅ Successfully ingested {result['ingested']} events")
-        return True
-    else:
-        print(f"❌ Failed to ingest data: {response.status_code}")
-        print(f"   Response: {response.text}")
-        return False
+    print(f"✅ Successfully ingested {ingested} events")
+    return True
 
 def check_metrics():
     """Check current system metrics"""
-    response = requests.get(f"{BASE_URL}/metrics")
+    response = SESSION.get(f"{BASE_URL}/metrics")
     if response.status_code == 200:
         data = response.json()
         print(f"\n📈 Current System Metrics:")
@@ -93,6 +133,7 @@ def check_metrics():
     return None
 
 def main():
+    """Generates and ingests the realtime batch. Returns True if it was ingested."""
     print("=" * 80)
     print("REAL-TIME ANOMALY DETECTION TEST")
     print("=" * 80)
@@ -103,14 +144,15 @@ def main():
     # Generate and ingest data
     events = generate_realtime_telemetry_with_anomalies()
     
-    if ingest_data(events):
+    ingested = ingest_data(events)
+    if ingested:
         check_metrics()
         
         print("\n" + "=" * 80)
         print("NEXT STEPS")
         print("=" * 80)
         print("1. ✅ Data ingested with current timestamps")
-        print("2. ⏳ Wait for Celery Beat to trigger detection (runs every 5 minutes)")
+        print("2. ⏳ Wait for Celery Beat to trigger detection (runs every ~30 seconds)")
         print("3. 🔍 Watch the Celery worker terminal for detection logs")
         print("4. 📊 Run: python scripts/testing/verify_anomalies.py")
         print()
@@ -119,10 +161,11 @@ def main():
         print("   - fuel_pressure (value ~150 PSI, normal: 300-350 PSI)")
         print("   - acceleration_z (value ~30 m/s², normal: 8-12 m/s²)")
         print()
-        print("🕐 Celery Beat schedule: Every 5 minutes")
-        print("   Next detection will run in < 5 minutes")
+        print("🕐 Celery Beat schedule: Every 30 seconds (± jitter)")
+        print("   Next detection will run in < 1 minute")
     else:
         print("\n❌ Failed to ingest data. Check if FastAPI server is running.")
+    return ingested
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
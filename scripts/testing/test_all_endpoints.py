@@ -1,17 +1,119 @@
 """
 Comprehensive endpoint testing script for Rocket Telemetry AI System
 Tests all endpoints: /ingest, /ask, /summary, /metrics, /anomalies
+
+Set ROCKET_TEST_MOCK=1 to call the FastAPI app in-process instead of over
+HTTP; no API server is needed, but the database still is.
 """
 
+import io
+import os
+import sys
+import zlib
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import orjson
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 
 BASE_URL = "http://localhost:8000"
+
+@lru_cache(maxsize=None)
+def in_process_client():
+    """TestClient that calls app.main:app directly, without a socket"""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app, base_url=BASE_URL)
+
+if os.getenv("ROCKET_TEST_MOCK") == "1":
+    # Same request API, but requests go straight to the ASGI app
+    SESSION = in_process_client()
+else:
+    # One keep-alive connection pool (with connect retries) for every call in
+    # this script. Only one host is used; the pool is sized for the concurrent
+    # tests plus the /ask queries they fan out.
+    SESSION = requests.Session()
+    SESSION.mount(
+        "http://",
+        HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.3),
+        ),
+    )
+SESSION.headers.update({"Content-Type": "application/json"})
 TEST_DATA_DIR = Path(__file__).parent.parent.parent / "tests" / "data"
 
+class RateLimiter:
+    """Sliding-window limiter: at most max_calls starts per period, across threads"""
+    
+    def __init__(self, max_calls, period=1.0):
+        self.period = period
+        self.calls = deque(maxlen=max_calls)
+        self.lock = threading.Lock()
+    
+    def wait(self):
+        """Blocks only as long as needed to stay within the limit"""
+        with self.lock:
+            if len(self.calls) == self.calls.maxlen:
+                elapsed = time.monotonic() - self.calls[0]
+                if elapsed < self.period:
+                    time.sleep(self.period - elapsed)
+            self.calls.append(time.monotonic())
+
+class ThreadOutput:
+    """sys.stdout proxy that sends a thread's prints to its own buffer while capturing"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+    
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer or self.stream).write(text)
+    
+    def flush(self):
+        buffer = getattr(self.local, "buffer", None)
+        (buffer or self.stream).flush()
+    
+    def capture(self, func):
+        """Runs func with this thread's output buffered; returns (result, output)"""
+        self.local.buffer = io.StringIO()
+        try:
+            return func(), self.local.buffer.getvalue()
+        finally:
+            self.local.buffer = None
+
+def run_concurrently(tests):
+    """
+    Runs the named test functions in parallel threads, then prints each one's
+    buffered output in order. Returns {name: passed}.
+    """
+    output = ThreadOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+            futures = {
+                name: executor.submit(output.capture, func)
+                for name, func in tests.items()
+            }
+    finally:
+        sys.stdout = output.stream
+    
+    results = {}
+    for name, future in futures.items():
+        results[name], text = future.result()
+        print(text, end="")
+    return results
+
 def print_header(text):
     """Print formatted header"""
     print("\n" + "="*80)
@@ -28,20 +130,52 @@ def print_result(endpoint, status_code, response_data):
     else:
         print(f"Response: {response_data}")
 
-def test_ingest_data(file_path):
-    """Test /ingest endpoint"""
-    print_header(f"TEST 1: INGEST DATA - {file_path.name}")
-    
-    with open(file_path, 'r') as f:
-        data = json.load(f)
+def gzip_chunks(parts):
+    """Gzip-compresses an iterable of byte strings as a stream, for a chunked upload"""
+    # wbits=31 writes the gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(1, zlib.DEFLATED, 31)
+    for part in parts:
+        compressed = compressor.compress(part)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def merged_events_body(event_lists):
+    """Yields one {"events": [...]} body spanning several event lists"""
+    yield b'{"events":['
+    first = True
+    for events in event_lists:
+        if not events:
+            continue
+        if not first:
+            yield b','
+        # Serialize each list once and splice it in without its brackets
+        yield orjson.dumps(events)[1:-1]
+        first = False
+    yield b']}'
+
+@lru_cache(maxsize=None)
+def load_events(file_path):
+    """Parses a test data file once; a tuple keeps the cached events read-only"""
+    return tuple(orjson.loads(Path(file_path).read_bytes())['events'])
+
+def test_ingest_data(file_paths):
+    """Test /ingest endpoint with every file merged into one batch"""
+    print_header(f"TEST 1: INGEST DATA - {', '.join(p.name for p in file_paths)}")
     
-    print(f"📊 Loading {len(data)} telemetry events...")
+    event_lists = []
+    for file_path in file_paths:
+        events = load_events(file_path)
+        print(f"📊 {file_path.name}: {len(events)} events")
+        event_lists.append(events)
     
     try:
-        response = requests.post(
+        # One round-trip for all files; a generator body is sent with
+        # Transfer-Encoding: chunked
+        response = SESSION.post(
             f"{BASE_URL}/ingest",
-            json=data,
-            headers={"Content-Type": "application/json"}
+            data=gzip_chunks(merged_events_body(event_lists)),
+            headers={"Content-Encoding": "gzip"}
         )
         print_result("/ingest", response.status_code, response.json())
         return response.status_code == 200
@@ -54,7 +188,7 @@ def test_metrics():
     print_header("TEST 2: GET METRICS")
     
     try:
-        response = requests.get(f"{BASE_URL}/metrics")
+        response = SESSION.get(f"{BASE_URL}/metrics")
         print_result("/metrics", response.status_code, response.json())
         return response.status_code == 200
     except Exception as e:
@@ -70,7 +204,7 @@ def test_anomalies(asset_id="rocket-1"):
         from datetime import timedelta
         since = (datetime.now() - timedelta(hours=24)).isoformat()
         
-        response = requests.get(
+        response = SESSION.get(
             f"{BASE_URL}/anomalies",
             params={
                 "asset_id": asset_id,
@@ -99,7 +233,7 @@ def test_summary(asset_id="rocket-1"):
     print_header(f"TEST 4: GET SUMMARY - {asset_id}")
     
     try:
-        response = requests.get(
+        response = SESSION.get(
             f"{BASE_URL}/summary",
             params={
                 "asset_id": asset_id,
@@ -125,15 +259,27 @@ def test_ask_queries():
         "List all anomalies detected"
     ]
     
+    # At most two questions sent per second, to stay under the AI rate limit;
+    # nobody sleeps unless that rate is actually exceeded
+    limiter = RateLimiter(max_calls=2, period=1.0)
+    
+    def ask(query):
+        limiter.wait()
+        return SESSION.post(
+            f"{BASE_URL}/ask",
+            json={"question": query}  # Fixed: use 'question' not 'query'
+        )
+    
+    # The questions are independent, so send them concurrently and report
+    # the answers in order
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        futures = [executor.submit(ask, query) for query in queries]
+    
     results = []
-    for query in queries:
+    for query, future in zip(queries, futures):
         print(f"\n🔍 Query: '{query}'")
         try:
-            response = requests.post(
-                f"{BASE_URL}/ask",
-                json={"question": query},  # Fixed: use 'question' not 'query'
-                headers={"Content-Type": "application/json"}
-            )
+            response = future.result()
             data = response.json()
             print(f"Status: {response.status_code}")
             if response.status_code == 200:
@@ -144,8 +290,49 @@ def test_ask_queries():
         except Exception as e:
             print(f"❌ Error: {e}")
             results.append(False)
-        
-        time.sleep(2)  # Rate limiting for AI calls
+    
+    return all(results)
+
+def test_validation_errors():
+    """
+    Test request validation; rejected requests never reach a handler. Runs
+    in-process when the app can be loaded here, otherwise over HTTP.
+    """
+    print_header("TEST 6: REQUEST VALIDATION ERRORS")
+    
+    cases = [
+        ("Missing asset_id", "GET", "/anomalies",
+         {"params": {"since": "2025-11-20T08:00:00Z"}}),
+        ("Invalid since timestamp", "GET", "/anomalies",
+         {"params": {"asset_id": "rocket-1", "since": "yesterday"}}),
+        ("Missing summary asset_id", "GET", "/summary", {}),
+        ("Invalid JSON body", "POST", "/ingest",
+         {"content": b'{"events": [', "headers": {"Content-Type": "application/json"}}),
+        ("Missing question", "POST", "/ask", {"json": {}}),
+    ]
+    
+    try:
+        client, base = in_process_client(), ""
+    except Exception as e:
+        # Loading the app needs its database and settings; the live server
+        # can check the same cases
+        print(f"⚠️  Could not load the app in-process ({e}); checking over HTTP")
+        client, base = SESSION, BASE_URL
+    
+    results = []
+    for name, method, path, kwargs in cases:
+        if isinstance(client, requests.Session):
+            # requests takes a raw body as data=, TestClient as content=
+            kwargs = {("data" if k == "content" else k): v for k, v in kwargs.items()}
+        try:
+            response = client.request(method, base + path, **kwargs)
+            passed = response.status_code == 422
+            status = "✅ PASS" if passed else "❌ FAIL"
+            print(f"{status} - {name}: {method} {path} -> {response.status_code}")
+            results.append(passed)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            results.append(False)
     
     return all(results)
 
@@ -155,7 +342,7 @@ def test_health_check():
     
     try:
         # Test /metrics as a simple health check
-        response = requests.get(f"{BASE_URL}/metrics")
+        response = SESSION.get(f"{BASE_URL}/metrics")
         print(f"API Status: {response.status_code}")
         if response.status_code == 200:
             print("✅ API is responding")
@@ -164,6 +351,33 @@ def test_health_check():
         print(f"❌ Error: {e}")
         return False
 
+def run_tests(results):
+    """Runs every test in order, recording pass/fail into results"""
+    # Test 0: Health Check
+    results['health'] = test_health_check()
+    
+    # Test 1: Ingest normal and anomalous data in a single batch
+    data_files = [
+        TEST_DATA_DIR / "normal" / "test_data_normal_operation.json",
+        TEST_DATA_DIR / "anomalous" / "test_data_anomalous_data.json",
+    ]
+    missing = [f for f in data_files if not f.exists()]
+    for data_file in missing:
+        print(f"⚠️  Data file not found: {data_file}")
+    present = [f for f in data_files if f.exists()]
+    ingested = test_ingest_data(present) if present else False
+    results['ingest'] = ingested and not missing
+    
+    # Tests 2-6 only read, so they run side by side; wall time is the
+    # slowest test rather than the sum of all of them
+    results.update(run_concurrently({
+        'metrics': test_metrics,
+        'anomalies': lambda: test_anomalies("rocket-1"),
+        'summary': lambda: test_summary("rocket-1"),
+        'ask': test_ask_queries,
+        'validation': test_validation_errors,
+    }))
+
 def main():
     """Run all endpoint tests"""
     print("\n" + "🚀"*40)
@@ -171,43 +385,10 @@ def main():
     print("🚀"*40)
     
     results = {}
-    
-    # Test 0: Health Check
-    results['health'] = test_health_check()
-    time.sleep(1)
-    
-    # Test 1: Ingest normal data
-    normal_data_file = TEST_DATA_DIR / "normal" / "test_data_normal_operation.json"
-    if normal_data_file.exists():
-        results['ingest_normal'] = test_ingest_data(normal_data_file)
-        time.sleep(2)
-    else:
-        print(f"⚠️  Normal data file not found: {normal_data_file}")
-        results['ingest_normal'] = False
-    
-    # Test 1b: Ingest anomalous data
-    anomalous_data_file = TEST_DATA_DIR / "anomalous" / "test_data_anomalous_data.json"
-    if anomalous_data_file.exists():
-        results['ingest_anomalous'] = test_ingest_data(anomalous_data_file)
-        time.sleep(2)
-    else:
-        print(f"⚠️  Anomalous data file not found: {anomalous_data_file}")
-        results['ingest_anomalous'] = False
-    
-    # Test 2: Get Metrics
-    results['metrics'] = test_metrics()
-    time.sleep(1)
-    
-    # Test 3: Get Anomalies
-    results['anomalies'] = test_anomalies("rocket-1")
-    time.sleep(1)
-    
-    # Test 4: Get Summary
-    results['summary'] = test_summary("rocket-1")
-    time.sleep(1)
-    
-    # Test 5: Ask Queries
-    results['ask'] = test_ask_queries()
+    try:
+        run_tests(results)
+    finally:
+        SESSION.close()
     
     # Print final summary
     print_header("TEST RESULTS SUMMARY")
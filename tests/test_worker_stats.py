@@ -0,0 +1,84 @@
+"""
+Unit tests for the incremental window statistics in app.worker.
+"""
+
+import numpy as np
+import pytest
+
+from app import config, worker
+
+
+def _stats(values):
+    return worker._batch_stats(np.asarray(values, dtype=np.float32))
+
+
+def _assert_stats_close(actual, expected):
+    assert actual[0] == expected[0]
+    assert actual[1] == pytest.approx(expected[1], rel=1e-5)
+    assert actual[2] == pytest.approx(expected[2], rel=1e-4, abs=1e-4)
+
+
+def test_merge_matches_batch():
+    a, b = [1.0, 2.0, 4.0, 8.0], [3.0, 5.0, 7.0]
+    merged = worker._merge_stats(_stats(a), _stats(b))
+    _assert_stats_close(merged, _stats(a + b))
+
+
+def test_remove_inverts_merge():
+    a, b = [10.0, 12.0, 9.5, 11.0, 10.5], [20.0, 7.0]
+    total = worker._merge_stats(_stats(a), _stats(b))
+    _assert_stats_close(worker._remove_stats(total, _stats(b)), _stats(a))
+
+
+def test_remove_empty_and_all():
+    total = _stats([1.0, 2.0, 3.0])
+    assert worker._remove_stats(total, _stats([])) == total
+    assert worker._remove_stats(total, total) == (0, 0.0, 0.0)
+
+
+def test_remove_more_rows_than_total_forces_rebuild():
+    assert worker._remove_stats(_stats([1.0, 2.0]), _stats([1.0, 2.0, 3.0])) is None
+
+
+def test_late_arrival_outlier_forces_rebuild():
+    # The cached window never saw the late 1000.0 row, but it is subtracted
+    # when it expires; the resulting statistics are impossible.
+    cached = _stats([10.0, 10.0, 10.0, 10.0, 10.1])
+    expired = _stats([10.0, 1000.0])
+    assert worker._remove_stats(cached, expired) is None
+
+
+def test_late_arrival_in_range_drifts_count():
+    # A late row close to the window's values passes the consistency check;
+    # the count drifts by one until the next full rebuild.
+    cached = _stats([10.0, 11.0, 12.0, 13.0, 14.0])
+    removed = worker._remove_stats(cached, _stats([10.0, 12.0]))
+    assert removed is not None
+    assert removed[0] == 3
+
+
+class _FakeRedis:
+    def __init__(self, data):
+        self.data = data
+
+    def hgetall(self, key):
+        return self.data.get(key, {})
+
+
+def test_load_window_stats_falls_back_to_previous_bucket(monkeypatch):
+    key = worker._stats_key("rocket-1", "engine_temp", 99)
+    monkeypatch.setattr(worker, "redis_client", _FakeRedis({key: {"age": "0"}}))
+    assert worker._load_window_stats("rocket-1", "engine_temp", 100) == {"age": "0"}
+    assert worker._load_window_stats("rocket-1", "engine_temp", 101) is None
+
+
+def test_load_window_stats_rebuilds_once_per_window(monkeypatch):
+    max_age = (
+        config.ANOMALY_WINDOW_SIZE_SECONDS // config.ANOMALY_SCHEDULE_INTERVAL_SECONDS
+    )
+    key = worker._stats_key("rocket-1", "engine_temp", 100)
+    fake = _FakeRedis({key: {"age": str(max_age - 1)}})
+    monkeypatch.setattr(worker, "redis_client", fake)
+    assert worker._load_window_stats("rocket-1", "engine_temp", 100) is not None
+    fake.data[key]["age"] = str(max_age)
+    assert worker._load_window_stats("rocket-1", "engine_temp", 100) is None